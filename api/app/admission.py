@@ -0,0 +1,184 @@
+"""
+In-process admission control: per-user and global token buckets per endpoint
+class, and a bounded, deadline-limited queue in front of heavy queries
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Dict, Tuple
+
+# Per-user bucket entries kept before idle (full) buckets are dropped
+_MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; status_code is 429 (caller over its limit) or 503 (server busy)"""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class TokenBucket:
+    """rate tokens per second up to burst; one token per request unless charged more"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> float:
+        """Take cost tokens (at most a full bucket); returns 0, or the seconds until they are available"""
+        cost = min(cost, self.burst)
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else 3600.0
+
+    def give_back(self, cost: float = 1) -> None:
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def idle(self, now: float) -> bool:
+        """Full again: equivalent to a fresh bucket, safe to drop"""
+        return self.available(now) >= self.burst
+
+
+class HeavySlots:
+    """At most limit heavy queries at once; others wait up to deadline, at most queue_size of them"""
+
+    def __init__(self, limit: int, queue_size: int, deadline_seconds: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.deadline_seconds = deadline_seconds
+        self.active = 0
+        self.waiting = 0
+        self.queued = 0
+        self.timed_out = 0
+        self.max_wait_ms = 0.0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and self.waiting == 0:
+            await self._semaphore.acquire()
+            self.active += 1
+            return
+        if self.waiting >= self.queue_size:
+            raise AdmissionRejected(503, self.deadline_seconds, "Too many heavy queries waiting, retry later")
+        self.waiting += 1
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.deadline_seconds)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AdmissionRejected(503, self.deadline_seconds, "Heavy query not started within the queue deadline")
+        finally:
+            self.waiting -= 1
+            self.max_wait_ms = max(self.max_wait_ms, (time.perf_counter() - started) * 1000)
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "queued": self.queued,
+            "timed_out": self.timed_out,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+
+class AdmissionController:
+    """
+    Token buckets per endpoint class: each caller has its own bucket (429 when
+    empty) and all callers share a global one (503 when empty). Heavy requests
+    also need one of the heavy slots
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]], heavy_slots: HeavySlots):
+        self.limits = limits
+        self.heavy = heavy_slots
+        self._global = {
+            endpoint_class: TokenBucket(limit["global_rate"], limit["global_burst"])
+            for endpoint_class, limit in limits.items()
+        }
+        self._users: Dict[Tuple[str, str], TokenBucket] = {}
+        self.admitted = {endpoint_class: 0 for endpoint_class in limits}
+        self.rejected_user = {endpoint_class: 0 for endpoint_class in limits}
+        self.rejected_global = {endpoint_class: 0 for endpoint_class in limits}
+
+    def _user_bucket(self, endpoint_class: str, user: str, now: float) -> TokenBucket:
+        key = (endpoint_class, user)
+        bucket = self._users.get(key)
+        if bucket is None:
+            if len(self._users) >= _MAX_TRACKED_USERS:
+                self._users = {k: b for k, b in self._users.items() if not b.idle(now)}
+            limit = self.limits[endpoint_class]
+            bucket = self._users[key] = TokenBucket(limit["user_rate"], limit["user_burst"])
+        return bucket
+
+    def check_rate(self, endpoint_class: str, user: str, cost: int = 1) -> None:
+        """Take cost tokens from the caller's and the global bucket, or raise AdmissionRejected"""
+        now = time.monotonic()
+        user_bucket = self._user_bucket(endpoint_class, user, now)
+        wait = user_bucket.take(now, cost)
+        if wait:
+            self.rejected_user[endpoint_class] += 1
+            raise AdmissionRejected(429, wait, f"Rate limit exceeded for {endpoint_class} requests")
+        wait = self._global[endpoint_class].take(now, cost)
+        if wait:
+            # The caller was within its own limit; don't charge it for a busy server
+            user_bucket.give_back(cost)
+            self.rejected_global[endpoint_class] += 1
+            raise AdmissionRejected(503, wait, f"Server busy with {endpoint_class} requests, retry later")
+        self.admitted[endpoint_class] += cost
+
+    def usage(self, user: str) -> Dict[str, Any]:
+        """Tokens left for one caller, per endpoint class"""
+        now = time.monotonic()
+        return {
+            endpoint_class: {
+                "remaining": math.floor(self._users[(endpoint_class, user)].available(now))
+                if (endpoint_class, user) in self._users else int(limit["user_burst"]),
+                "burst": limit["user_burst"],
+                "rate_per_second": limit["user_rate"],
+            }
+            for endpoint_class, limit in self.limits.items()
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Global usage for /health"""
+        now = time.monotonic()
+        return {
+            "enabled": True,
+            "tracked_users": len(self._users),
+            "classes": {
+                endpoint_class: {
+                    "global_remaining": math.floor(self._global[endpoint_class].available(now)),
+                    "global_burst": limit["global_burst"],
+                    "admitted": self.admitted[endpoint_class],
+                    "rejected_429": self.rejected_user[endpoint_class],
+                    "rejected_503": self.rejected_global[endpoint_class],
+                }
+                for endpoint_class, limit in self.limits.items()
+            },
+            "heavy": self.heavy.status(),
+        }
@@ -0,0 +1,275 @@
+"""
+Query audit log: events are queued in memory on the request path and written
+to pipeline.audit_log in batches by a background task
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import orjson
+from psycopg2.extras import execute_values
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# What happens to a new event when the queue is full (or, for "sample", filling up)
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "sample")
+
+# Queue fill ratio above which the "sample" policy keeps only a fraction of events
+SAMPLE_WATERMARK = 0.5
+
+_INSERT_SQL = """
+    INSERT INTO pipeline.audit_log (
+        id, table_name, operation, changed_at, changed_by,
+        endpoint, status_code, filters, row_count, latency_ms
+    ) VALUES %s
+"""
+
+
+def _filters_json(body: bytes, truncated: bool, query_string: bytes) -> Optional[str]:
+    """Request body (or query string) as a JSON document for the filters column"""
+    if body:
+        if not truncated:
+            try:
+                orjson.loads(body)
+                return body.decode("utf-8")
+            except (orjson.JSONDecodeError, UnicodeDecodeError):
+                pass
+        return orjson.dumps({"raw": body.decode("utf-8", "replace"), "truncated": truncated}).decode()
+    if query_string:
+        return orjson.dumps({"query": query_string.decode("latin-1")}).decode()
+    return None
+
+
+class AuditLogger:
+    """Bounded in-memory queue of audit events, flushed in batches by a background task"""
+
+    def __init__(
+        self,
+        connection_factory,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_seconds: float = 2,
+        overflow_policy: str = "drop_oldest",
+        sample_rate: float = 0.1
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow_policy}")
+        self.connection_factory = connection_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # Only touched from the event loop, so no lock is needed
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def record(self, event: Dict[str, Any]) -> None:
+        """Queue an event without blocking; applies the overflow policy"""
+        backlog = len(self._queue)
+        if self.overflow_policy == "sample" and backlog >= self.max_queue * SAMPLE_WATERMARK:
+            if backlog >= self.max_queue:
+                self.dropped += 1
+                return
+            if random.random() >= self.sample_rate:
+                self.sampled_out += 1
+                return
+        elif backlog >= self.max_queue:
+            if self.overflow_policy == "drop_newest":
+                self.dropped += 1
+                return
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(event)
+        self.recorded += 1
+        if self._ready is not None and len(self._queue) >= self.batch_size:
+            self._ready.set()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    @staticmethod
+    def _row(event: Dict[str, Any]) -> tuple:
+        rows = event.get("rows")
+        if callable(rows):
+            # Counted here, off the request path (e.g. parsing a cached page once)
+            try:
+                rows = rows()
+            except Exception:
+                rows = None
+        return (
+            uuid.uuid4().hex,
+            event["resource"][:100],
+            event["method"],
+            event["at"],
+            (event.get("user") or "anonymous")[:100],
+            event["path"][:500],
+            event["status"],
+            _filters_json(event.get("body", b""), event.get("truncated", False), event.get("query_string", b"")),
+            rows,
+            round(event["latency_ms"], 3),
+        )
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        """Insert one batch with a single statement"""
+        started = time.perf_counter()
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            try:
+                execute_values(cursor, _INSERT_SQL, [self._row(event) for event in batch], page_size=len(batch))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def flush(self) -> None:
+        """Write every queued event, one batch at a time"""
+        while self._queue:
+            batch = self._take_batch()
+            try:
+                await run_in_threadpool(self.write, batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.last_error = None
+            except Exception as e:
+                # The queue stays bounded: a failed batch is counted and discarded
+                self.failed += len(batch)
+                self.last_error = str(e)
+                logger.error(f"Error writing {len(batch)} audit events: {str(e)}")
+                return
+
+    async def run(self) -> None:
+        """Flush every flush_seconds, or as soon as a full batch is queued"""
+        self._ready = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def status(self) -> Dict[str, Any]:
+        """Queue state for /health"""
+        return {
+            "enabled": True,
+            "backlog": self.backlog,
+            "capacity": self.max_queue,
+            "overflow_policy": self.overflow_policy,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+            "error": self.last_error,
+        }
+
+
+class AuditMiddleware:
+    """ASGI middleware that records one audit event per request under path_prefix"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        audit: Callable[[], Optional[AuditLogger]],
+        path_prefix: str = "/api/v1/data/",
+        body_max_bytes: int = 4096
+    ):
+        self.app = app
+        # Resolved per request: the logger is created on startup
+        self.audit = audit
+        self.path_prefix = path_prefix
+        self.body_max_bytes = body_max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        audit = self.audit()
+        if scope["type"] != "http" or audit is None or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        at = datetime.now(timezone.utc)
+        # Endpoints and the auth dependency leave the user and row count here
+        state = scope.setdefault("state", {})
+        captured = {"body": b"", "truncated": False, "status": 500, "rows": None}
+
+        async def receive_captured() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and not captured["truncated"]:
+                room = self.body_max_bytes - len(captured["body"])
+                chunk = message.get("body", b"")
+                captured["body"] += chunk[:room]
+                captured["truncated"] = len(chunk) > room
+            return message
+
+        async def send_captured(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                row_count = Headers(raw=message["headers"]).get("x-row-count")
+                if row_count and row_count.isdigit():
+                    captured["rows"] = int(row_count)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_captured, send_captured)
+        finally:
+            path = scope["path"]
+            audit.record({
+                "at": at,
+                "method": scope["method"],
+                "path": path,
+                # Dataset segment of /api/v1/data/<dataset>/...
+                "resource": path[len(self.path_prefix):].split("/", 1)[0] or path,
+                "user": state.get("user"),
+                "status": captured["status"],
+                "rows": captured["rows"] if captured["rows"] is not None else state.get("audit_rows"),
+                "body": captured["body"],
+                "truncated": captured["truncated"],
+                "query_string": scope.get("query_string", b""),
+                "latency_ms": (time.perf_counter() - started) * 1000,
+            })
@@ -2,12 +2,18 @@
 JWT Authentication module
 """
 
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException, status
+from typing import Any, Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .metrics import AUTH_SECONDS
 from .schemas import TokenData
 
 # Configuration
@@ -21,22 +27,105 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Security scheme
 security = HTTPBearer()
 
-# Mock user database (replace with real database in production)
+# Built-in accounts with precomputed hashes, used until a user store is
+# configured (scripts, tests); the API reads pipeline.api_users (db/init/10_api_users.sql)
 fake_users_db = {
     "admin": {
         "username": "admin",
-        "hashed_password": pwd_context.hash("admin123"),
+        "hashed_password": "$2b$12$R11idRtcQqeEhlvtM1q69uAwu2xf3VvlhicLzCIhTVbGoR1yMJjde",
         "full_name": "Administrator",
-        "email": "admin@example.com"
+        "email": "admin@example.com",
+        "disabled": False
     },
     "user": {
         "username": "user",
-        "hashed_password": pwd_context.hash("user123"),
+        "hashed_password": "$2b$12$jxi6pbDcnBvBbVksWHWiK.r0FCg89b5QjrpUzOoWDKHFqiwIWGQIq",
         "full_name": "Regular User",
-        "email": "user@example.com"
+        "email": "user@example.com",
+        "disabled": False
     }
 }
 
+# Verified against for unknown usernames, so they take as long as a wrong password
+_DUMMY_HASH = fake_users_db["user"]["hashed_password"]
+
+
+class UserStore:
+    """API users from pipeline.api_users, or the built-in accounts when no database is configured"""
+
+    def __init__(self, connection_factory=None):
+        self.connection_factory = connection_factory
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        if self.connection_factory is None:
+            return fake_users_db.get(username)
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT username, hashed_password, full_name, email, disabled
+                FROM pipeline.api_users
+                WHERE username = %s
+            """, (username,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return None
+        return dict(zip(("username", "hashed_password", "full_name", "email", "disabled"), row))
+
+
+class TokenCache:
+    """Bounded LRU of verified token -> user, each entry valid until min(token expiry, TTL)"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def set(self, token: str, user: Dict[str, Any], expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (min(expires_at, time.time() + self.ttl_seconds), user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+user_store = UserStore()
+token_cache = TokenCache(
+    max_entries=settings.auth_token_cache_max_entries,
+    ttl_seconds=settings.auth_token_cache_ttl_seconds,
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -46,16 +135,14 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def get_user(username: str):
-    """Get user from database"""
-    if username in fake_users_db:
-        user_dict = fake_users_db[username]
-        return user_dict
-    return None
+    """Get user from the user store"""
+    return user_store.get(username)
 
 def authenticate_user(username: str, password: str):
-    """Authenticate a user"""
+    """Authenticate a user; blocking (bcrypt), run it in the threadpool"""
     user = get_user(username)
     if not user:
+        verify_password(password, _DUMMY_HASH)
         return False
     if not verify_password(password, user["hashed_password"]):
         return False
@@ -72,28 +159,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current user from JWT token"""
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current user from JWT token; verified tokens are cached until they expire (or the TTL)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    user = get_user(username=token_data.username)
+    token = credentials.credentials
+    started = time.perf_counter()
+    user = token_cache.get(token)
     if user is None:
-        raise credentials_exception
+        # Labelled "rejected" unless the token verifies
+        path = "rejected"
+        try:
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                username: str = payload.get("sub")
+                if username is None:
+                    raise credentials_exception
+                token_data = TokenData(username=username)
+            except JWTError:
+                raise credentials_exception
+            user = await run_in_threadpool(get_user, token_data.username)
+            if user is None:
+                raise credentials_exception
+            token_cache.set(token, user, payload.get("exp", 0))
+            path = "verified"
+        finally:
+            AUTH_SECONDS.observe(time.perf_counter() - started, path)
+    else:
+        AUTH_SECONDS.observe(time.perf_counter() - started, "cached")
+    # Read by the audit middleware
+    request.state.user = user["username"]
     return user
 
 async def get_current_active_user(current_user = Depends(get_current_user)):
     """Get current active user"""
-    if current_user is None:
+    if current_user is None or current_user.get("disabled"):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_current_admin_user(current_user = Depends(get_current_active_user)):
+    """Get current user, if listed in settings.admin_users"""
+    if current_user["username"] not in settings.admin_users:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
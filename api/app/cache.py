@@ -0,0 +1,146 @@
+"""
+In-process response cache with pre-compressed variants
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import orjson
+
+from starlette.concurrency import run_in_threadpool
+
+from .compression import DEFAULT_THREADPOOL_MIN_SIZE, compress
+
+
+class CachedBody:
+    """Response body kept together with its compressed variants"""
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str,
+        levels: Optional[Dict[str, int]] = None,
+        threadpool_min_size: int = DEFAULT_THREADPOOL_MIN_SIZE
+    ):
+        self.body = body
+        self.media_type = media_type
+        self.levels = levels or {}
+        self.threadpool_min_size = threadpool_min_size
+        self.created = time.monotonic()
+        self._variants: Dict[str, bytes] = {}
+        self._rows: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        """Body compressed with the given encoding; compressed once per entry"""
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    variant = compress(self.body, encoding, self.levels.get(encoding))
+                    self._variants[encoding] = variant
+        return variant
+
+    async def encoded_async(self, encoding: str) -> bytes:
+        """encoded(), compressing large bodies in the threadpool instead of on the event loop"""
+        variant = self._variants.get(encoding)
+        if variant is not None:
+            return variant
+        if len(self.body) >= self.threadpool_min_size:
+            return await run_in_threadpool(self.encoded, encoding)
+        return self.encoded(encoding)
+
+    def row_count(self) -> Optional[int]:
+        """Rows in a JSON page (a list or an envelope); parsed once per entry"""
+        if self._rows is None and self.media_type == "application/json":
+            document = orjson.loads(self.body)
+            if isinstance(document, list):
+                self._rows = len(document)
+            elif isinstance(document, dict) and isinstance(document.get("returned"), int):
+                self._rows = document["returned"]
+            elif isinstance(document, dict) and isinstance(document.get("rows"), list):
+                self._rows = len(document["rows"])
+        return self._rows
+
+
+class ResponseCache:
+    """
+    Bounded LRU of response bodies with a time-to-live. epoch advances on every
+    clear(); a body computed from a query started before a clear is not stored
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 60,
+        levels: Optional[Dict[str, int]] = None,
+        threadpool_min_size: int = DEFAULT_THREADPOOL_MIN_SIZE
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.levels = levels or {}
+        self.threadpool_min_size = threadpool_min_size
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_skipped = 0
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        """Return a fresh entry or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        media_type: str = "application/json",
+        epoch: Optional[int] = None
+    ) -> CachedBody:
+        """
+        Store a body and return its cache entry. With epoch (read before the
+        query started) the body is only stored if no clear() happened since
+        """
+        entry = CachedBody(body, media_type, self.levels, self.threadpool_min_size)
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                self.stale_skipped += 1
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        """Drop every entry (e.g. after a new data load)"""
+        with self._lock:
+            self._entries.clear()
+            self.epoch += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Entry count and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_skipped": self.stale_skipped,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,76 @@
+"""
+Columnar (Apache Arrow) helpers for analytics exports
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+# Spreadsheet columns the ETL stores as ISO-8601 strings
+CALIDAD_DATE_COLUMNS = ("FECHA DE MP", "FECHA DE PROCESO")
+
+# Metadata columns added next to the spreadsheet columns
+CALIDAD_META_COLUMNS = ("id", "created_at", "row_index")
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+def _to_string_array(values: List[Any]) -> pa.Array:
+    """Fallback for columns mixing strings and numbers"""
+    return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def build_column(name: str, values: List[Any]) -> pa.Array:
+    """Build a typed Arrow array for a spreadsheet column"""
+    if name in CALIDAD_DATE_COLUMNS:
+        try:
+            return pc.cast(_to_string_array(values), pa.timestamp("us"))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return _to_string_array(values)
+    try:
+        array = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return _to_string_array(values)
+    if pa.types.is_null(array.type):
+        return array.cast(pa.string())
+    return array
+
+
+def build_calidad_table(rows: Iterable[Dict[str, Any]], columns: Optional[List[str]] = None) -> pa.Table:
+    """Build a flat Arrow table from calidad rows (one dict per row, spreadsheet keys plus metadata)"""
+    rows = list(rows)
+    if columns is None:
+        # Keep the first-seen key order so the layout matches the spreadsheet
+        names: Dict[str, None] = {}
+        for row in rows:
+            for key in row:
+                names.setdefault(key, None)
+        columns = list(names)
+
+    arrays = []
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        if name == "created_at":
+            arrays.append(pa.array(values, type=pa.timestamp("us", tz="UTC")))
+        else:
+            arrays.append(build_column(name, values))
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+
+def table_to_ipc_bytes(table: pa.Table) -> bytes:
+    """Serialize a table as an Arrow IPC stream"""
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def table_to_parquet_bytes(table: pa.Table) -> bytes:
+    """Serialize a table as a Parquet file"""
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,234 @@
+"""
+Content-negotiated response compression (zstd, brotli, gzip)
+"""
+
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+# Server preference when the client accepts several encodings with the same q-value
+_PREFERENCE = ("zstd", "br", "gzip")
+
+# Media types that are already compressed and would only waste CPU, plus
+# event streams, whose frames must reach the client as soon as they are sent
+_SKIP_MEDIA_TYPES = ("application/vnd.apache.parquet", "application/zip", "application/gzip", "image/", "text/event-stream")
+
+DEFAULT_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+# Bodies from this size are compressed in the threadpool: a multi-MB page takes
+# tens of milliseconds and would stall every other request on the event loop
+DEFAULT_THREADPOOL_MIN_SIZE = 64 * 1024
+
+
+def available_encodings() -> List[str]:
+    """Encodings supported by the installed libraries, in server preference order"""
+    supported = {"gzip"}
+    if brotli is not None:
+        supported.add("br")
+    if zstandard is not None:
+        supported.add("zstd")
+    return [encoding for encoding in _PREFERENCE if encoding in supported]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best encoding for an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best: Optional[Tuple[float, int, str]] = None
+    for rank, encoding in enumerate(available_encodings()):
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q <= 0:
+            continue
+        candidate = (q, -rank, encoding)
+        if best is None or candidate > best:
+            best = candidate
+    return best[2] if best else None
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compress a complete body with the given encoding"""
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+async def compress_async(
+    body: bytes,
+    encoding: str,
+    level: Optional[int] = None,
+    threadpool_min_size: int = DEFAULT_THREADPOOL_MIN_SIZE
+) -> bytes:
+    """compress(), run in the threadpool for bodies of threadpool_min_size bytes or more"""
+    if len(body) >= threadpool_min_size:
+        return await run_in_threadpool(compress, body, encoding, level)
+    return compress(body, encoding, level)
+
+
+class _StreamCompressor:
+    """Incremental compressor with a common interface for streamed bodies"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+    def chunk(self, body: bytes, last: bool) -> bytes:
+        """Compressed output for one body message, flushed on the last one"""
+        chunk = self.compress(body)
+        return chunk + self.finish() if last else chunk
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses above a size threshold"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        levels: Optional[Dict[str, int]] = None,
+        threadpool_min_size: int = DEFAULT_THREADPOOL_MIN_SIZE
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.threadpool_min_size = threadpool_min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app, encoding, self.levels[encoding], self.minimum_size, self.threadpool_min_size
+        )
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    """Per-request state of CompressionMiddleware"""
+
+    def __init__(self, app: ASGIApp, encoding: str, level: int, minimum_size: int, threadpool_min_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.threadpool_min_size = threadpool_min_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressor: Optional[_StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            # Bodies already encoded upstream (e.g. pre-compressed cache entries) pass through
+            self.passthrough = "content-encoding" in headers or content_type.startswith(_SKIP_MEDIA_TYPES)
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None and self.start_message is not None:
+            if not more_body:
+                # Whole body in one message: compress only above the threshold
+                if len(body) < self.minimum_size:
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                compressed = await compress_async(body, self.encoding, self.level, self.threadpool_min_size)
+                headers = MutableHeaders(raw=self.start_message["headers"])
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming body: compress incrementally without Content-Length
+            self.compressor = _StreamCompressor(self.encoding, self.level)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(self.start_message)
+            self.start_message = None
+
+        # Messages of one response are sent in order, so the compressor is never shared
+        if len(body) >= self.threadpool_min_size:
+            chunk = await run_in_threadpool(self.compressor.chunk, body, not more_body)
+        else:
+            chunk = self.compressor.chunk(body, not more_body)
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,156 @@
+"""
+Dataset registry: where each data_type lives, which columns it returns,
+what clients may filter on and which indexes back those queries
+"""
+
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Spreadsheet keys clients may filter on. Substring filters on the text keys are
+# backed by trigram indexes, exact matches by the GIN index on processed_data->'data'
+# (db/init/03_calidad_indexes.sql).
+TEXT_FILTER_KEYS = (
+    "EMPRESA",
+    "PRODUCTOR",
+    "VARIEDAD",
+    "DESTINO",
+    "PRESENTACION",
+    "TIPO DE CAJA",
+    "N° FCL",
+    "TRAZABILIDAD",
+)
+MATCH_FILTER_KEYS = TEXT_FILTER_KEYS + ("TURNO", "MODULO", "FECHA DE MP", "FECHA DE PROCESO")
+
+# Short keys the filterable columns are stored under in processed_data->'data'.
+# Fixed because the indexes and materialized views use them; must match the
+# pipeline.data_columns seed in db/init/01_init.sql. Other columns get their
+# short key from the loader and are resolved inside Postgres.
+CALIDAD_STORAGE_KEYS = {key: str(position) for position, key in enumerate(MATCH_FILTER_KEYS)}
+
+def _data_field(key: str, as_text: bool = True) -> str:
+    """processed_data->'data' accessor for a filterable calidad column"""
+    return f"processed_data->'data'->{'>' if as_text else ''}'{CALIDAD_STORAGE_KEYS[key]}'"
+
+# Typed fields of the filter DSL: SQL expression and Postgres type. The
+# expressions match the expression indexes in db/init/04_calidad_filter_indexes.sql.
+TYPED_FILTER_FIELDS = {
+    **{key: (_data_field(key), "text") for key in TEXT_FILTER_KEYS},
+    "TURNO": (f"pipeline.jsonb_numeric({_data_field('TURNO', as_text=False)})", "numeric"),
+    "MODULO": (f"pipeline.jsonb_numeric({_data_field('MODULO', as_text=False)})", "numeric"),
+    "FECHA DE MP": (f"pipeline.iso_date({_data_field('FECHA DE MP')})", "date"),
+    "FECHA DE PROCESO": (f"pipeline.iso_date({_data_field('FECHA DE PROCESO')})", "date"),
+    "created_at": ("created_at", "timestamptz"),
+}
+
+
+class Dataset:
+    """A queryable dataset and the metadata the generic query builder needs"""
+
+    def __init__(
+        self,
+        name: str,
+        table: str,
+        columns: Sequence[str],
+        data_type: Optional[str] = None,
+        order_by: Sequence[Tuple[str, str]] = (("created_at", "DESC"), ("id", "ASC")),
+        text_filter_keys: Sequence[str] = (),
+        match_keys: Sequence[str] = (),
+        typed_fields: Optional[Dict[str, Tuple[str, str]]] = None,
+        projectable: bool = False,
+        storage_keys: Optional[Dict[str, str]] = None,
+        indexes: Optional[Dict[str, str]] = None
+    ):
+        self.name = name
+        self.table = table
+        # Top-level columns returned for each row, in response order
+        self.columns = tuple(columns)
+        # Discriminator when the rows share pipeline.pipeline_data
+        self.data_type = data_type
+        self.order_by = tuple(order_by)
+        self.text_filter_keys = tuple(text_filter_keys)
+        self.match_keys = tuple(match_keys)
+        self.typed_fields = typed_fields or {"created_at": ("created_at", "timestamptz")}
+        # processed_data has the {record_id, row_index, processed_at, data} layout,
+        # so sparse fieldsets can be projected inside Postgres
+        self.projectable = projectable
+        # Column name -> short key for pipeline_data rows in the compact format
+        # (db/init/08_compact_storage.sql); None for datasets stored verbatim
+        self.storage_keys = storage_keys
+        # Index name -> idempotent DDL backing the default order and filters
+        self.indexes = indexes or {}
+
+    @property
+    def compact(self) -> bool:
+        return self.storage_keys is not None
+
+    def storage_key(self, key: str) -> str:
+        """Short key of a filterable column"""
+        return self.storage_keys.get(key, key) if self.storage_keys is not None else key
+
+    def order_sql(self, alias: Optional[str] = None) -> str:
+        """ORDER BY list, optionally qualified with a table alias"""
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(f"{prefix}{column} {direction}" for column, direction in self.order_by)
+
+
+def _raw_table_dataset(name: str, table: str) -> Dataset:
+    """Dataset over one of the raw_data/processed_data tables loaded by the ETL"""
+    short = table.split(".")[-1]
+    return Dataset(
+        name=name,
+        table=table,
+        columns=("id", "source_file", "created_at", "raw_data", "processed_data"),
+        indexes={
+            f"idx_{short}_created_at":
+                f"CREATE INDEX IF NOT EXISTS idx_{short}_created_at ON {table} (created_at DESC, id)",
+        },
+    )
+
+
+CALIDAD_DATASET = Dataset(
+    name="calidad_producto_terminado",
+    table="pipeline.pipeline_data",
+    data_type="calidad_producto_terminado",
+    columns=("id", "source_file", "created_at", "updated_at", "processed_data"),
+    text_filter_keys=TEXT_FILTER_KEYS,
+    match_keys=MATCH_FILTER_KEYS,
+    typed_fields=TYPED_FILTER_FIELDS,
+    projectable=True,
+    storage_keys=CALIDAD_STORAGE_KEYS,
+    # Filter and ordering indexes live in db/init/03_*, 04_* and 06_*; the data_type
+    # literal in every query prunes the scan to this dataset's partition
+    indexes={},
+)
+
+DATASETS: Dict[str, Dataset] = {
+    dataset.name: dataset
+    for dataset in (
+        CALIDAD_DATASET,
+        _raw_table_dataset("employees", "pipeline.employee_data"),
+        _raw_table_dataset("sales", "pipeline.sales_data"),
+        _raw_table_dataset("production", "pipeline.production_data"),
+    )
+}
+
+
+def get_dataset(name: str) -> Optional[Dataset]:
+    """Registered dataset by name, or None"""
+    return DATASETS.get(name)
+
+
+def ensure_dataset_indexes(db) -> None:
+    """Create the registered indexes that do not exist yet"""
+    cursor = db.cursor()
+    try:
+        for dataset in DATASETS.values():
+            for name, ddl in dataset.indexes.items():
+                cursor.execute(ddl)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating dataset indexes: {str(e)}")
+        raise
+    finally:
+        cursor.close()
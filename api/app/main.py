@@ -4,7 +4,8 @@ Provides REST endpoints for querying processed data from PostgreSQL
 Optimized for high concurrency (30+ requests/minute)
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import psycopg2
@@ -12,18 +13,38 @@ from psycopg2 import pool
 import json
 from datetime import datetime, timedelta
 import os
-from contextlib import contextmanager
-from typing import Optional, Dict, Any, List
+import socket
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional, Dict, Any, Callable, List, Tuple
+import orjson
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import threading
+import time
 
 # Import our modules
-from .schemas import CalidadProductoTerminado, CalidadProductoTerminadoRequest, CalidadProductoTerminadoEmpresaRequest, UserLogin, Token
-from .auth import authenticate_user, create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from .schemas import CalidadProductoTerminado, CalidadProductoTerminadoRequest, CalidadProductoTerminadoEmpresaRequest, CalidadProductoTerminadoBatchQuery, CalidadProductoTerminadoBatchRequest, CalidadProductoTerminadoExportRequest, CalidadProductoTerminadoAggregateRequest, DatasetRequest, UserLogin, Token
+from .auth import authenticate_user, create_access_token, get_current_active_user, get_current_admin_user, token_cache, user_store, ACCESS_TOKEN_EXPIRE_MINUTES
 from .services import DataService
+from .columnar import ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE, table_to_ipc_bytes, table_to_parquet_bytes
+from .config import settings
+from .compression import CompressionMiddleware, negotiate_encoding
+from .cache import CachedBody, ResponseCache
+from .replica import ReplicaManager, ReplicaUnsupported
+from .singleflight import SingleFlight
+from .statements import query_shapes, statement_hooks
+from .notifications import GenerationFeed, INVALIDATION_CHANNEL, INVALIDATION_SCOPES, format_sse, publish_invalidation
+from .datasets import CALIDAD_DATASET, Dataset, ensure_dataset_indexes, get_dataset
+from .audit import AuditLogger, AuditMiddleware
+from .admission import AdmissionController, AdmissionRejected, HeavySlots
+from .querylog import SlowQueryLog
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS, MetricsMiddleware, registry as metrics_registry
 
 app = FastAPI(
     title="Pipeline APG Air API",
     description="Data Pipeline API for OneDrive to PostgreSQL - High Concurrency Optimized",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -35,22 +56,235 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses for clients that accept zstd, br or gzip
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    levels=settings.compression_levels,
+    threadpool_min_size=settings.compression_threadpool_min_size,
+)
+
+# Audit event per data request, queued here and written off the request path
+audit_logger = None
+
+app.add_middleware(
+    AuditMiddleware,
+    audit=lambda: audit_logger,
+    body_max_bytes=settings.audit_body_max_bytes,
+)
+
+# Request count, latency and size per route; outermost, so sizes are as sent
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Serialized calidad responses, kept with their compressed variants
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    levels=settings.compression_levels,
+    threadpool_min_size=settings.compression_threadpool_min_size,
+)
+
+# Loader-maintained statistics rows, shared by the stats endpoints
+statistics_cache = ResponseCache(
+    max_entries=16,
+    ttl_seconds=settings.statistics_cache_ttl_seconds,
+    levels=settings.compression_levels,
+    threadpool_min_size=settings.compression_threadpool_min_size,
+)
+
+async def cached_response(http_request: Request, entry: CachedBody) -> Response:
+    """Serve a cache entry, pre-compressed when the client accepts it"""
+    # Counted by the audit writer, once per entry
+    http_request.state.audit_rows = entry.row_count
+    encoding = negotiate_encoding(http_request.headers.get("accept-encoding"))
+    if encoding and len(entry.body) >= settings.compression_min_size:
+        return Response(
+            content=await entry.encoded_async(encoding),
+            media_type=entry.media_type,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
+    return Response(content=entry.body, media_type=entry.media_type)
+
+# Concurrent identical calidad queries share one database call
+query_flight = SingleFlight()
+
+async def cached_fetch(cache: ResponseCache, key: str, fetch: Callable[..., bytes], *args, **kwargs) -> CachedBody:
+    """
+    Cache entry for key; on a miss fetch(*args, **kwargs) runs once for all
+    concurrent callers. A body from a query that started before a cache clear
+    (a new generation) is served but not stored, and callers arriving after the
+    clear start their own query instead of joining the stale one
+    """
+    epoch = cache.epoch
+    entry = cache.get(key)
+    if entry is None:
+        content = await query_flight.do(f"{key}#{epoch}", fetch, *args, **kwargs)
+        entry = cache.set(key, content, epoch=epoch)
+    return entry
+
+def request_key(prefix: str, request) -> str:
+    """Normalized request key: defaults filled in and dict keys sorted"""
+    normalized = orjson.dumps(request.model_dump(mode="json"), option=orjson.OPT_SORT_KEYS)
+    return f"{prefix}:{normalized.decode('utf-8')}"
+
+# This process among the API workers (gunicorn or uvicorn --workers)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+WORKER_COUNT = max(settings.web_concurrency, 1)
+
+# Admission control per endpoint class, so one caller cannot exhaust the pool;
+# server-wide limits are divided among the workers
+admission = AdmissionController(
+    {
+        endpoint_class: {
+            **limit,
+            "global_rate": limit["global_rate"] / WORKER_COUNT,
+            "global_burst": max(1, limit["global_burst"] / WORKER_COUNT),
+        }
+        for endpoint_class, limit in settings.admission_limits.items()
+    },
+    HeavySlots(
+        max(1, settings.admission_heavy_max_concurrent // WORKER_COUNT),
+        settings.admission_heavy_queue_size,
+        settings.admission_heavy_queue_seconds,
+    ),
+) if settings.admission_enabled else None
+
+@asynccontextmanager
+async def admitted(caller: str, endpoint_class: str, sub_queries: int = 0):
+    """
+    Hold admission for one request: a rate token, plus a slot for heavy
+    requests. Each sub-query of a batch also costs a query-class token
+    """
+    if admission is None:
+        yield
+        return
+    try:
+        if sub_queries:
+            admission.check_rate("query", caller, cost=sub_queries)
+        admission.check_rate(endpoint_class, caller)
+        if endpoint_class == "heavy":
+            await admission.heavy.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    try:
+        yield
+    finally:
+        if endpoint_class == "heavy":
+            admission.heavy.release()
+
+async def page_class(request: Request) -> str:
+    """
+    A calidad page is heavy without a limit or above admission_heavy_limit rows;
+    a body that is not JSON (validation rejects it later) is charged as heavy
+    """
+    # FastAPI has already parsed the body; request.json() returns the cached document
+    try:
+        body = await request.json()
+    except ValueError:
+        return "heavy"
+    limit = body.get("limit") if isinstance(body, dict) else None
+    return "heavy" if not isinstance(limit, int) or limit > settings.admission_heavy_limit else "query"
+
+async def batch_size(request: Request) -> int:
+    """Sub-queries in a batch request body (0 if it is not JSON; validation rejects it later)"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return 0
+    queries = body.get("queries") if isinstance(body, dict) else None
+    return len(queries) if isinstance(queries, dict) else 0
+
+def admit(endpoint_class: str):
+    """
+    Route dependency for authenticated endpoints; endpoint_class "page" is
+    resolved per request, and "batch" is a heavy request charged per sub-query
+    """
+    async def dependency(request: Request, current_user = Depends(get_current_active_user)):
+        sub_queries = 0
+        if endpoint_class == "page":
+            resolved = await page_class(request)
+        elif endpoint_class == "batch":
+            resolved, sub_queries = "heavy", await batch_size(request)
+        else:
+            resolved = endpoint_class
+        async with admitted(current_user["username"], resolved, sub_queries):
+            yield
+    return dependency
+
+def admit_public(endpoint_class: str):
+    """Route dependency for endpoints without authentication, keyed by client address"""
+    async def dependency(request: Request):
+        async with admitted(f"ip:{request.client.host if request.client else 'unknown'}", endpoint_class):
+            yield
+    return dependency
+
 # Database connection pool for high concurrency
 connection_pool = None
 
+# One slot per pooled connection: getconn() raises PoolError when every
+# connection is out, so threadpool callers wait here for one instead
+connection_slots: Optional[threading.BoundedSemaphore] = None
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within db_pool_wait_timeout_seconds"""
+
+# Connection parameters shared by the pool, the fallback and the LISTEN connection
+DB_CONNECT_KWARGS = {"dsn": settings.api_database_url} if settings.api_database_url else {
+    "host": "pipeline-postgres",
+    "database": "pipeline_db",
+    "user": "pipeline_user",
+    "password": "pipeline_pass",
+}
+
+def connection_budget() -> Optional[int]:
+    """Connections all API workers may hold together, or None if it cannot be read"""
+    if settings.db_pool_budget > 0:
+        return settings.db_pool_budget
+    try:
+        conn = psycopg2.connect(**DB_CONNECT_KWARGS)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT current_setting('max_connections')::int
+                     - current_setting('superuser_reserved_connections')::int
+            """)
+            available = cursor.fetchone()[0]
+            cursor.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Failed to read max_connections: {e}")
+        return None
+    return available - settings.db_reserved_connections
+
+def pool_limits() -> Tuple[int, int]:
+    """(minconn, maxconn) of this worker's pool: its share of the connection budget"""
+    budget = connection_budget()
+    if budget is None:
+        maxconn = settings.db_pool_max_per_worker
+    else:
+        # The LISTEN connection of the generation feed is outside the pool
+        listener = 1 if settings.generation_events_enabled else 0
+        share = budget // WORKER_COUNT - listener
+        if share < 1:
+            print(f"Connection budget {budget} is too small for {WORKER_COUNT} workers; using 1 connection per worker")
+        maxconn = max(1, min(settings.db_pool_max_per_worker, share))
+    return min(settings.db_pool_min_per_worker, maxconn), maxconn
+
 def init_db_pool():
     """Initialize database connection pool"""
-    global connection_pool
+    global connection_pool, connection_slots
     try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            minconn=5,      # Minimum connections
-            maxconn=50,     # Maximum connections (for 30 req/min)
-            host="pipeline-postgres",
-            database="pipeline_db",
-            user="pipeline_user",
-            password="pipeline_pass"
+        minconn, maxconn = pool_limits()
+        # Shared by the threadpool workers of this process
+        connection_pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn=minconn,
+            maxconn=maxconn,
+            **DB_CONNECT_KWARGS
         )
-        print("Database connection pool initialized successfully")
+        connection_slots = threading.BoundedSemaphore(maxconn)
+        print(f"Database connection pool initialized successfully ({minconn}-{maxconn} connections, worker {WORKER_ID} of {WORKER_COUNT})")
     except Exception as e:
         print(f"Failed to initialize connection pool: {e}")
         connection_pool = None
@@ -59,37 +293,240 @@ def init_db_pool():
 def get_db_connection():
     """Get database connection from pool with automatic cleanup"""
     conn = None
+    slot = False
     try:
+        started = time.perf_counter()
         if connection_pool:
+            timeout = settings.db_pool_wait_timeout_seconds
+            slot = connection_slots.acquire(timeout=timeout)
+            # The wait is on the slot; getconn() itself never blocks
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, "pool")
+            if not slot:
+                DB_POOL_TIMEOUTS.inc()
+                raise PoolTimeout(f"No database connection available within {timeout} s")
             conn = connection_pool.getconn()
             yield conn
         else:
             # Fallback to direct connection if pool fails
-            conn = psycopg2.connect(
-                host="pipeline-postgres",
-                database="pipeline_db",
-                user="pipeline_user",
-                password="pipeline_pass"
-            )
+            conn = psycopg2.connect(**DB_CONNECT_KWARGS)
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, "fallback")
             yield conn
     except Exception as e:
         print(f"Database connection error: {e}")
         raise
     finally:
-        if conn and connection_pool:
-            connection_pool.putconn(conn)
-        elif conn:
-            conn.close()
+        try:
+            if conn and connection_pool:
+                connection_pool.putconn(conn)
+            elif conn:
+                conn.close()
+        finally:
+            if slot:
+                connection_slots.release()
+
+def server_error(e: Exception, detail: str) -> HTTPException:
+    """500 for a failed request; 503 with Retry-After when no pooled connection freed up in time"""
+    if isinstance(e, PoolTimeout):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return HTTPException(status_code=500, detail=detail)
+
+def pool_connections():
+    """Pooled connections by state, read on each /metrics scrape"""
+    if connection_pool is None:
+        return []
+    # Consistent snapshot: getconn/putconn change both lists under the pool lock
+    with connection_pool._lock:
+        in_use = len(connection_pool._used)
+        idle = len(connection_pool._pool)
+    return [
+        (("in_use",), in_use),
+        (("idle",), idle),
+        (("max",), connection_pool.maxconn),
+    ]
+
+def cache_counts(counter: str):
+    """Hits or misses of each in-process cache, read on each /metrics scrape"""
+    caches = {"response": response_cache, "statistics": statistics_cache, "token": token_cache}
+    return [((name,), cache.stats()[counter]) for name, cache in caches.items()]
+
+metrics_registry.collected("api_db_pool_connections", "Pooled connections by state", ("state",), pool_connections)
+metrics_registry.collected("api_cache_hits_total", "In-process cache hits", ("cache",), lambda: cache_counts("hits"), "counter")
+metrics_registry.collected("api_cache_misses_total", "In-process cache misses", ("cache",), lambda: cache_counts("misses"), "counter")
+metrics_registry.collected(
+    "api_query_coalesced_total", "Calidad queries answered by an identical in-flight query", (),
+    lambda: [((), query_flight.coalesced)], "counter"
+)
+if admission is not None:
+    metrics_registry.collected(
+        "api_heavy_queries", "Heavy queries running and waiting for a slot", ("state",),
+        lambda: [(("active",), admission.heavy.active), (("waiting",), admission.heavy.waiting)]
+    )
+
+# Slow statements from DataService, with sampled EXPLAIN ANALYZE plans
+slow_query_log = None
+
+# Optional in-memory replica of the current calidad generation
+replica_manager = None
+
+def fetch_calidad_page(**query) -> bytes:
+    """Serialized calidad page; see fetch_dataset_page"""
+    return fetch_dataset_page(CALIDAD_DATASET, **query)
+
+def resolve_as_of(dataset: Dataset, as_of: datetime):
+    """Generation to read for as_of, and whether it is the current one"""
+    if not dataset.data_type:
+        raise ValueError(f"Generations are not recorded for dataset {dataset.name}")
+    with get_db_connection() as conn:
+        resolved = DataService().resolve_generation(conn, dataset.data_type, as_of)
+    if resolved is None:
+        raise ValueError(f"No {dataset.name} generation at or before {as_of.isoformat()} within the retention window")
+    return resolved
+
+def fetch_dataset_page(
+    dataset: Dataset,
+    envelope: bool = False,
+    count: str = "exact",
+    as_of: Optional[datetime] = None,
+    **query
+) -> bytes:
+    """
+    Serialized dataset page, from the in-memory replica for calidad when it
+    is loaded, otherwise from Postgres. With envelope=True the page is
+    wrapped with total, has_more and timing. as_of reads a past generation
+    rebuilt from the generation history
+    """
+    started = time.perf_counter()
+    content, meta, source = None, None, "replica"
+    generation = history = None
+    if as_of is not None:
+        generation, is_current = resolve_as_of(dataset, as_of)
+        # The current generation is served from the live table (or the replica)
+        history = None if is_current else generation
+    
+    replica = replica_manager.replica if replica_manager and dataset is CALIDAD_DATASET and history is None else None
+    if replica is not None:
+        try:
+            if envelope:
+                content, meta = replica.query_page_json(**query)
+            else:
+                return replica.query_json(**query)
+        except ReplicaUnsupported:
+            pass
+    
+    if content is None:
+        # Postgres serializes the page; the bytes skip per-row model validation
+        source = "postgres" if history is None else "history"
+        service = DataService()
+        with get_db_connection() as conn:
+            if not envelope:
+                return service.get_dataset_json(conn, dataset, as_of=history, **query)
+            content, meta = service.get_dataset_page_json(conn, dataset, count=count, as_of=history, **query)
+    
+    if generation is not None:
+        meta = {**meta, "generation": generation.isoformat()}
+    header = orjson.dumps({
+        **meta,
+        "limit": query.get("limit"),
+        "offset": query.get("offset") or 0,
+        "timing": {"source": source, "query_ms": round((time.perf_counter() - started) * 1000, 3)},
+    })
+    # Splice the page into the envelope without re-parsing it
+    return header[:-1] + b',"data":' + content + b"}"
+
+def clear_caches() -> None:
+    """Drop cached responses after a new generation is loaded"""
+    response_cache.clear()
+    statistics_cache.clear()
+
+# Push feed of new generations (LISTEN/NOTIFY from the loader)
+generation_feed = None
+
+def invalidate_local(scope: str) -> None:
+    """Clear this worker's caches for an invalidation scope"""
+    if scope in ("responses", "all"):
+        clear_caches()
+    if scope in ("tokens", "all"):
+        token_cache.clear()
+
+def signal_invalidation(scope: str) -> None:
+    """NOTIFY the other workers to clear their caches too"""
+    with get_db_connection() as conn:
+        publish_invalidation(conn, scope, WORKER_ID)
+
+def on_invalidation(event: Dict[str, Any]) -> None:
+    """Another worker invalidated its caches; this one follows"""
+    if event.get("origin") != WORKER_ID and event.get("scope") in INVALIDATION_SCOPES:
+        invalidate_local(event["scope"])
+
+def on_generation(event: Dict[str, Any]) -> None:
+    """A load committed: drop stale responses and reload the replica now"""
+    clear_caches()
+    if replica_manager and event.get("data_type") == CALIDAD_DATASET.data_type:
+        asyncio.get_running_loop().create_task(replica_manager.refresh_now())
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize resources on startup"""
+    global replica_manager, generation_feed, audit_logger, slow_query_log
     init_db_pool()
+    user_store.connection_factory = get_db_connection
+    if settings.slow_query_log_enabled:
+        slow_query_log = SlowQueryLog(
+            get_db_connection,
+            threshold_ms=settings.slow_query_threshold_ms,
+            explain_enabled=settings.slow_query_explain_enabled,
+            explain_sample_rate=settings.slow_query_explain_sample_rate,
+            explain_min_interval_seconds=settings.slow_query_explain_min_interval_seconds,
+            explain_queue_size=settings.slow_query_explain_queue_size,
+            explain_timeout_seconds=settings.slow_query_explain_timeout_seconds,
+        )
+        statement_hooks.append(slow_query_log.observe)
+        slow_query_log.start()
+    if settings.audit_enabled:
+        audit_logger = AuditLogger(
+            get_db_connection,
+            max_queue=settings.audit_queue_size,
+            batch_size=settings.audit_batch_size,
+            flush_seconds=settings.audit_flush_seconds,
+            overflow_policy=settings.audit_overflow_policy,
+            sample_rate=settings.audit_sample_rate,
+        )
+        audit_logger.start()
+    if settings.dataset_indexes_on_startup:
+        try:
+            with get_db_connection() as conn:
+                ensure_dataset_indexes(conn)
+        except Exception as e:
+            print(f"Failed to create dataset indexes: {e}")
+    if settings.calidad_replica_enabled:
+        replica_manager = ReplicaManager(
+            get_db_connection,
+            refresh_seconds=settings.calidad_replica_refresh_seconds,
+            on_swap=clear_caches,
+        )
+        replica_manager.start()
+    if settings.generation_events_enabled:
+        generation_feed = GenerationFeed(
+            lambda: psycopg2.connect(**DB_CONNECT_KWARGS),
+            on_generation=[on_generation],
+            listeners={INVALIDATION_CHANNEL: on_invalidation},
+        )
+        generation_feed.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup resources on shutdown"""
     global connection_pool
+    if generation_feed:
+        await generation_feed.stop()
+    if replica_manager:
+        await replica_manager.stop()
+    if audit_logger:
+        # Queued events are written before the pool closes
+        await audit_logger.stop()
+    if slow_query_log:
+        statement_hooks.remove(slow_query_log.observe)
+        await slow_query_log.stop()
     if connection_pool:
         connection_pool.closeall()
         print("Database connection pool closed")
@@ -101,7 +538,8 @@ async def root():
 @app.post("/api/v1/auth/login", response_model=Token)
 async def login(user_credentials: UserLogin):
     """Login endpoint to get JWT token"""
-    user = authenticate_user(user_credentials.username, user_credentials.password)
+    # bcrypt takes tens of milliseconds; keep it off the event loop
+    user = await run_in_threadpool(authenticate_user, user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -125,6 +563,56 @@ async def get_current_user_info(current_user = Depends(get_current_active_user))
         "email": current_user["email"]
     }
 
+@app.get("/api/v1/usage")
+async def get_usage(current_user = Depends(get_current_active_user)):
+    """Requests left in the caller's rate limits, per endpoint class"""
+    if admission is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "username": current_user["username"],
+        "limits": admission.usage(current_user["username"]),
+        "heavy": admission.heavy.status()
+    }
+
+@app.get("/api/v1/admin/slow-queries")
+async def list_slow_queries(limit: int = 50, shape: Optional[str] = None, current_user = Depends(get_current_admin_user)):
+    """Most recent slow statements seen by this process, with their shape and parameters"""
+    if slow_query_log is None:
+        raise HTTPException(status_code=404, detail="Slow-query log is disabled")
+    return {
+        "status": slow_query_log.status(),
+        "queries": slow_query_log.recent(limit=limit, shape=shape),
+        "top_shapes": query_shapes.top_shapes()
+    }
+
+@app.get("/api/v1/admin/slow-queries/plans")
+async def list_slow_query_plans(limit: int = 20, shape: Optional[str] = None, current_user = Depends(get_current_admin_user)):
+    """EXPLAIN (ANALYZE, BUFFERS) plans captured for slow statements"""
+    if slow_query_log is None:
+        raise HTTPException(status_code=404, detail="Slow-query log is disabled")
+    try:
+        return await run_in_threadpool(slow_query_log.plans, min(limit, 200), shape)
+    except Exception as e:
+        raise server_error(e, f"Error retrieving slow query plans: {str(e)}")
+
+@app.post("/api/v1/admin/cache/invalidate")
+async def invalidate_caches(scope: str = "all", current_user = Depends(get_current_admin_user)):
+    """Clear response and/or token caches in every API worker"""
+    if scope not in INVALIDATION_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of: {', '.join(INVALIDATION_SCOPES)}")
+    invalidate_local(scope)
+    try:
+        await run_in_threadpool(signal_invalidation, scope)
+    except Exception as e:
+        raise server_error(e, f"Error signalling cache invalidation: {str(e)}")
+    return {
+        "scope": scope,
+        "worker": WORKER_ID,
+        # Other workers only receive the signal through the generation feed's LISTEN connection
+        "broadcast": generation_feed is not None
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with connection pool status"""
@@ -140,6 +628,16 @@ async def health_check():
             "status": "healthy", 
             "database": "connected", 
             "connection_pool": pool_status,
+            "replica": replica_manager.status() if replica_manager else {"enabled": False},
+            "response_cache": response_cache.stats(),
+            "query_coalescing": query_flight.stats(),
+            "query_shapes": query_shapes.stats(),
+            "generation_events": generation_feed.status() if generation_feed else {"enabled": False},
+            "audit": audit_logger.status() if audit_logger else {"enabled": False},
+            "token_cache": token_cache.stats(),
+            "worker": {"id": WORKER_ID, "workers": WORKER_COUNT, "pool_max": connection_pool.maxconn if connection_pool else None},
+            "admission": admission.status() if admission else {"enabled": False},
+            "slow_queries": slow_query_log.status() if slow_query_log else {"enabled": False},
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -149,186 +647,436 @@ async def health_check():
             "timestamp": datetime.now().isoformat()
         }
 
-@app.get("/api/v1/data/employees")
-async def get_employees():
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, database, pool, cache and auth metrics in the Prometheus text format"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    # In the threadpool: collectors take locks (the pool's is held across putconn's rollback)
+    content = await run_in_threadpool(metrics_registry.render)
+    return PlainTextResponse(content, media_type=METRICS_CONTENT_TYPE)
+
+def legacy_dataset_page(name: str, limit: int, offset: int):
+    """Page of a raw dataset with named columns, for the legacy GET endpoints"""
+    service = DataService()
+    with get_db_connection() as conn:
+        return service.get_dataset_page_json(
+            conn, get_dataset(name), limit=min(limit, settings.max_page_size), offset=offset, count="none"
+        )
+
+@app.get("/api/v1/events/generations")
+async def stream_generations(current_user = Depends(get_current_active_user)):
+    """Server-Sent Events: one 'generation' event per committed load, current generations first"""
+    if generation_feed is None:
+        raise HTTPException(status_code=503, detail="Generation events are disabled")
+    
+    queue = generation_feed.subscribe()
+    
+    async def events():
+        try:
+            for event in list(generation_feed.latest.values()):
+                yield format_sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.generation_events_keepalive_seconds)
+                    yield format_sse(event)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+        finally:
+            generation_feed.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/v1/data/employees", dependencies=[Depends(admit_public("light"))])
+async def get_employees(limit: int = 100, offset: int = 0):
     """Get employee data"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM pipeline.employee_data LIMIT 100")
-            rows = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            employees = []
-            for row in rows:
-                employees.append({
-                    "id": row[0],
-                    "source_file": row[1],
-                    "created_at": row[2].isoformat() if row[2] else None,
-                    "raw_data": row[3],
-                    "processed_data": row[4]
-                })
-            
-            cursor.close()
-            return {"employees": employees, "count": len(employees)}
+        content, meta = await run_in_threadpool(legacy_dataset_page, "employees", limit, offset)
+        return Response(
+            content=b'{"employees":' + content + b',"count":' + str(meta["returned"]).encode() + b"}",
+            media_type="application/json"
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving employee data: {str(e)}")
+        raise server_error(e, f"Error retrieving employee data: {str(e)}")
 
-@app.get("/api/v1/data/sales")
-async def get_sales():
+@app.get("/api/v1/data/sales", dependencies=[Depends(admit_public("light"))])
+async def get_sales(limit: int = 100, offset: int = 0):
     """Get sales data"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM pipeline.sales_data LIMIT 100")
-            rows = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            sales = []
-            for row in rows:
-                sales.append({
-                    "id": row[0],
-                    "source_file": row[1],
-                    "created_at": row[2].isoformat() if row[2] else None,
-                    "raw_data": row[3],
-                    "processed_data": row[4]
-                })
-            
-            cursor.close()
-            return {"sales": sales, "count": len(sales)}
+        content, meta = await run_in_threadpool(legacy_dataset_page, "sales", limit, offset)
+        return Response(
+            content=b'{"sales":' + content + b',"count":' + str(meta["returned"]).encode() + b"}",
+            media_type="application/json"
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving sales data: {str(e)}")
+        raise server_error(e, f"Error retrieving sales data: {str(e)}")
 
-@app.get("/api/v1/data/production")
-async def get_production():
+@app.get("/api/v1/data/production", dependencies=[Depends(admit_public("light"))])
+async def get_production(limit: int = 100, offset: int = 0):
     """Get production data"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM pipeline.production_data LIMIT 100")
-            rows = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            production = []
-            for row in rows:
-                production.append({
-                    "id": row[0],
-                    "source_file": row[1],
-                    "created_at": row[2].isoformat() if row[2] else None,
-                    "raw_data": row[3],
-                    "processed_data": row[4]
-                })
-            
-            cursor.close()
-            return {"production": production, "count": len(production)}
+        content, meta = await run_in_threadpool(legacy_dataset_page, "production", limit, offset)
+        return Response(
+            content=b'{"production":' + content + b',"count":' + str(meta["returned"]).encode() + b"}",
+            media_type="application/json"
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving production data: {str(e)}")
+        raise server_error(e, f"Error retrieving production data: {str(e)}")
+
+def fetch_statistics() -> bytes:
+    """Statistics of every data_type, serialized"""
+    service = DataService()
+    with get_db_connection() as conn:
+        statistics = service.get_data_statistics(conn)
+    return orjson.dumps({"statistics": statistics})
 
-@app.get("/api/v1/data/statistics")
-async def get_statistics():
+@app.get("/api/v1/data/statistics", dependencies=[Depends(admit_public("light"))])
+async def get_statistics(http_request: Request):
     """Get data statistics"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM pipeline.data_statistics")
-            rows = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            statistics = []
-            for row in rows:
-                statistics.append({
-                    "id": row[0],
-                    "data_type": row[1],
-                    "record_count": row[2],
-                    "file_count": row[3],
-                    "earliest_record": row[4].isoformat() if row[4] else None,
-                    "latest_record": row[5].isoformat() if row[5] else None,
-                    "calculated_at": row[6].isoformat() if row[6] else None
-                })
-            
-            cursor.close()
-            return {"statistics": statistics}
+        entry = await cached_fetch(statistics_cache, "statistics", fetch_statistics)
+        
+        return await cached_response(http_request, entry)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving statistics: {str(e)}")
+        raise server_error(e, f"Error retrieving statistics: {str(e)}")
 
-@app.post("/api/v1/data/calidad-producto-terminado", response_model=List[CalidadProductoTerminado])
+@app.post("/api/v1/data/calidad-producto-terminado", response_model=List[CalidadProductoTerminado], dependencies=[Depends(admit("page"))])
 async def get_calidad_producto_terminado(
     request: CalidadProductoTerminadoRequest,
+    http_request: Request,
     current_user = Depends(get_current_active_user)
 ):
     """Get calidad producto terminado data with POST method and JWT authentication"""
     try:
-        service = DataService()
-        
-        # Use the service to get data
-        with get_db_connection() as conn:
-            data = service.get_calidad_producto_terminado(
-                db=conn,
-                limit=request.limit,
-                offset=request.offset,
-                filters=request.filters
-            )
+        cache_key = request_key("calidad", request)
+        entry = await cached_fetch(
+            response_cache,
+            cache_key,
+            fetch_calidad_page,
+            envelope=request.envelope,
+            count=request.count,
+            as_of=request.as_of,
+            limit=request.limit,
+            offset=request.offset,
+            filters=request.filters,
+            match=request.match,
+            where=request.where,
+            fields=request.fields
+        )
         
-        return data
+        return await cached_response(http_request, entry)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving calidad producto terminado data: {str(e)}")
+        raise server_error(e, f"Error retrieving calidad producto terminado data: {str(e)}")
 
-@app.post("/api/v1/data/calidad-producto-terminado/", response_model=List[CalidadProductoTerminado])
+@app.post("/api/v1/data/calidad-producto-terminado/", response_model=List[CalidadProductoTerminado], dependencies=[Depends(admit("page"))])
 async def get_calidad_producto_terminado_by_empresa(
     request: CalidadProductoTerminadoEmpresaRequest,
+    http_request: Request,
     current_user = Depends(get_current_active_user)
 ):
     """Get calidad producto terminado data filtered by empresa with POST method and JWT authentication"""
     try:
-        service = DataService()
+        cache_key = request_key("calidad-empresa", request)
+        entry = await cached_fetch(
+            response_cache,
+            cache_key,
+            fetch_calidad_page,
+            envelope=request.envelope,
+            count=request.count,
+            as_of=request.as_of,
+            empresa=request.empresa,
+            limit=request.limit,
+            offset=request.offset,
+            fields=request.fields
+        )
         
-        # Use the service to get data filtered by empresa
-        with get_db_connection() as conn:
-            data = service.get_calidad_producto_terminado_by_empresa(
-                db=conn,
-                empresa=request.empresa,
-                limit=request.limit,
-                offset=request.offset
-            )
+        return await cached_response(http_request, entry)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise server_error(e, f"Error retrieving calidad producto terminado data by empresa: {str(e)}")
+
+async def fetch_calidad_batch_item(query: CalidadProductoTerminadoBatchQuery) -> bytes:
+    """One batch sub-query, sharing the response cache and in-flight queries"""
+    # Each sub-query is one page: the batch returns at most max_page_size rows per query
+    query = query.model_copy(update={"limit": min(query.limit or settings.max_page_size, settings.max_page_size)})
+    cache_key = request_key("calidad-batch", query)
+    entry = await cached_fetch(
+        response_cache,
+        cache_key,
+        fetch_calidad_page,
+        envelope=query.envelope,
+        count=query.count,
+        as_of=query.as_of,
+        empresa=query.empresa,
+        limit=query.limit,
+        offset=query.offset,
+        filters=query.filters,
+        match=query.match,
+        where=query.where,
+        fields=query.fields
+    )
+    return entry.body
+
+@app.post("/api/v1/data/calidad-producto-terminado/batch", dependencies=[Depends(admit("batch"))])
+async def batch_calidad_producto_terminado(
+    request: CalidadProductoTerminadoBatchRequest,
+    current_user = Depends(get_current_active_user)
+):
+    """Run several calidad producto terminado queries concurrently; results and errors keyed by sub-query"""
+    try:
+        names = list(request.queries)
+        outcomes = await asyncio.gather(
+            *(fetch_calidad_batch_item(query) for query in request.queries.values()),
+            return_exceptions=True
+        )
+        
+        # Sub-results are already serialized; splice them without re-parsing
+        parts = []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, ValueError):
+                item = b'{"status":400,"error":' + orjson.dumps(str(outcome)) + b"}"
+            elif isinstance(outcome, BaseException):
+                detail = f"Error retrieving calidad producto terminado data: {str(outcome)}"
+                item = b'{"status":500,"error":' + orjson.dumps(detail) + b"}"
+            else:
+                item = b'{"status":200,"data":' + outcome + b"}"
+            parts.append(orjson.dumps(name) + b":" + item)
         
-        return data
+        return Response(content=b'{"results":{' + b",".join(parts) + b"}}", media_type="application/json")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving calidad producto terminado data by empresa: {str(e)}")
+        raise server_error(e, f"Error running calidad producto terminado batch: {str(e)}")
 
-@app.get("/api/v1/data/calidad-producto-terminado/stats")
-async def get_calidad_producto_terminado_stats():
-    """Get calidad producto terminado statistics"""
+def build_calidad_export(request: CalidadProductoTerminadoExportRequest):
+    """Serialized Arrow/Parquet export and its row count"""
+    service = DataService()
+    
+    # Projection and filters are applied in Postgres, typing in Arrow
+    with get_db_connection() as conn:
+        table = service.get_calidad_producto_terminado_table(
+            db=conn,
+            columns=request.columns,
+            filters=request.filters,
+            match=request.match,
+            where=request.where,
+            empresa=request.empresa,
+            limit=request.limit,
+            offset=request.offset
+        )
+    
+    if request.format == "parquet":
+        return table_to_parquet_bytes(table), table.num_rows
+    return table_to_ipc_bytes(table), table.num_rows
+
+@app.post("/api/v1/data/calidad-producto-terminado/export", dependencies=[Depends(admit("heavy"))])
+async def export_calidad_producto_terminado(
+    request: CalidadProductoTerminadoExportRequest,
+    current_user = Depends(get_current_active_user)
+):
+    """Export calidad producto terminado data as a flat Arrow IPC stream or Parquet file"""
     try:
-        with get_db_connection() as conn:
+        content, num_rows = await query_flight.do(
+            request_key("calidad-export", request),
+            build_calidad_export,
+            request
+        )
+        
+        if request.format == "parquet":
+            media_type = PARQUET_MEDIA_TYPE
+            filename = "calidad_producto_terminado.parquet"
+        else:
+            media_type = ARROW_STREAM_MEDIA_TYPE
+            filename = "calidad_producto_terminado.arrows"
+        
+        return Response(
+            content=content,
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-Row-Count": str(num_rows)
+            }
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise server_error(e, f"Error exporting calidad producto terminado data: {str(e)}")
+
+def fetch_calidad_aggregates(request: CalidadProductoTerminadoAggregateRequest) -> bytes:
+    """Aggregate rows from the materialized views refreshed by the loader after each load, serialized"""
+    service = DataService()
+    with get_db_connection() as conn:
+        rows = service.get_calidad_producto_terminado_aggregates(
+            db=conn,
+            group_by=request.group_by,
+            date_bucket=request.date_bucket,
+            metrics=request.metrics,
+            date_from=request.date_from,
+            date_to=request.date_to,
+            filters=request.filters
+        )
+    return orjson.dumps({
+        "group_by": request.group_by,
+        "date_bucket": request.date_bucket,
+        "rows": rows,
+        "count": len(rows)
+    })
+
+@app.post("/api/v1/data/calidad-producto-terminado/aggregate", dependencies=[Depends(admit("light"))])
+async def aggregate_calidad_producto_terminado(
+    request: CalidadProductoTerminadoAggregateRequest,
+    http_request: Request,
+    current_user = Depends(get_current_active_user)
+):
+    """Get calidad producto terminado counts and averages grouped by dimension and date"""
+    try:
+        cache_key = request_key("calidad-aggregate", request)
+        entry = await cached_fetch(response_cache, cache_key, fetch_calidad_aggregates, request)
+        
+        return await cached_response(http_request, entry)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise server_error(e, f"Error aggregating calidad producto terminado data: {str(e)}")
+
+def fetch_calidad_statistics() -> bytes:
+    """Calidad producto terminado statistics, serialized"""
+    service = DataService()
+    with get_db_connection() as conn:
+        rows = service.get_data_statistics(conn, "calidad_producto_terminado")
+        if rows:
+            # Written by the loader in the same transaction as the data
+            stats = rows[0]
+            result = {
+                "total_records": stats["record_count"],
+                "latest_update": stats["generation"],
+                "data_type": "calidad_producto_terminado",
+                "file_count": stats["file_count"],
+                "earliest_record": stats["earliest_record"],
+                "latest_record": stats["latest_record"],
+                "null_rates": stats["null_rates"],
+                "load_duration_seconds": stats["load_duration_seconds"],
+                "calculated_at": stats["calculated_at"]
+            }
+        else:
+            # No load has written statistics yet; compute the basics live
             cursor = conn.cursor()
-            
-            # Get total count
             cursor.execute("""
-                SELECT COUNT(*) as total_count
+                SELECT COUNT(*), MAX(created_at)
                 FROM pipeline.pipeline_data
                 WHERE data_type = 'calidad_producto_terminado'
             """)
-            total_count = cursor.fetchone()[0]
-            
-            # Get latest record
-            cursor.execute("""
-                SELECT created_at
-                FROM pipeline.pipeline_data
-                WHERE data_type = 'calidad_producto_terminado'
-                ORDER BY created_at DESC
-                LIMIT 1
-            """)
-            latest_record = cursor.fetchone()
-            latest_update = latest_record[0].isoformat() if latest_record else None
-            
+            total_count, latest_record = cursor.fetchone()
             cursor.close()
-            return {
+            result = {
                 "total_records": total_count,
-                "latest_update": latest_update,
+                "latest_update": latest_record.isoformat() if latest_record else None,
                 "data_type": "calidad_producto_terminado"
             }
+    return orjson.dumps(result)
+
+@app.get("/api/v1/data/calidad-producto-terminado/stats", dependencies=[Depends(admit_public("light"))])
+async def get_calidad_producto_terminado_stats(http_request: Request):
+    """Get calidad producto terminado statistics"""
+    try:
+        entry = await cached_fetch(statistics_cache, "calidad_producto_terminado", fetch_calidad_statistics)
+        
+        return await cached_response(http_request, entry)
+    except Exception as e:
+        raise server_error(e, f"Error retrieving calidad producto terminado stats: {str(e)}")
+
+def generation_history_dataset(data_type: str) -> Dataset:
+    """Registered dataset whose loads are recorded as generations"""
+    dataset = get_dataset(data_type)
+    if dataset is None or not dataset.data_type:
+        raise HTTPException(status_code=404, detail=f"No generation history for dataset: {data_type}")
+    return dataset
+
+def fetch_generations(dataset: Dataset) -> List[Dict[str, Any]]:
+    service = DataService()
+    with get_db_connection() as conn:
+        return service.get_generations(conn, dataset.data_type)
+
+def fetch_generation_changes(dataset: Dataset, generation: datetime, limit: int, offset: int) -> bytes:
+    service = DataService()
+    with get_db_connection() as conn:
+        return service.get_generation_changes_json(conn, dataset, generation, limit=limit, offset=offset)
+
+@app.get("/api/v1/data/{data_type}/generations", dependencies=[Depends(admit("light"))])
+async def list_generations(data_type: str, current_user = Depends(get_current_active_user)):
+    """Retained generations of a dataset with inserted/updated/deleted row counts"""
+    dataset = generation_history_dataset(data_type)
+    try:
+        generations = await run_in_threadpool(fetch_generations, dataset)
+        return ORJSONResponse({"data_type": dataset.data_type, "generations": generations})
+    except Exception as e:
+        raise server_error(e, f"Error retrieving {data_type} generations: {str(e)}")
+
+@app.get("/api/v1/data/{data_type}/generations/{generation}/changes", dependencies=[Depends(admit("query"))])
+async def get_generation_changes(
+    data_type: str,
+    generation: datetime,
+    limit: int = 1000,
+    offset: int = 0,
+    current_user = Depends(get_current_active_user)
+):
+    """Rows inserted (I), updated (U) or deleted (D) by one generation, ordered by row_index"""
+    dataset = generation_history_dataset(data_type)
+    try:
+        content = await run_in_threadpool(
+            fetch_generation_changes, dataset, generation, min(limit, settings.max_page_size), offset
+        )
+        return Response(
+            content=b'{"data_type":' + orjson.dumps(dataset.data_type)
+                + b',"generation":' + orjson.dumps(generation.isoformat())
+                + b',"changes":' + content + b"}",
+            media_type="application/json"
+        )
+    except Exception as e:
+        raise server_error(e, f"Error retrieving {data_type} generation changes: {str(e)}")
+
+# Registered after the fixed /api/v1/data/... routes so those keep precedence
+@app.post("/api/v1/data/{data_type}", dependencies=[Depends(admit("query"))])
+async def query_dataset(
+    data_type: str,
+    request: DatasetRequest,
+    http_request: Request,
+    current_user = Depends(get_current_active_user)
+):
+    """Query any registered dataset with filters, projection and pagination"""
+    dataset = get_dataset(data_type)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset not found: {data_type}")
+    try:
+        limit = min(request.limit or settings.default_page_size, settings.max_page_size)
+        cache_key = request_key(f"dataset:{dataset.name}", request)
+        entry = await cached_fetch(
+            response_cache,
+            cache_key,
+            fetch_dataset_page,
+            dataset,
+            envelope=request.envelope,
+            count=request.count,
+            as_of=request.as_of,
+            limit=limit,
+            offset=request.offset,
+            filters=request.filters,
+            match=request.match,
+            where=request.where,
+            fields=request.fields
+        )
+        
+        return await cached_response(http_request, entry)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving calidad producto terminado stats: {str(e)}")
+        raise server_error(e, f"Error retrieving {data_type} data: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,287 @@
+"""
+In-process metrics in the Prometheus text format (GET /metrics): counters and
+histograms updated on the request path, gauges read from their owners on scrape
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Starlette appends "; charset=utf-8" to text/ media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds: from cached responses (sub-millisecond) to exports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Bytes: from a stats document to an unbounded page
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative buckets, sum and count per label combination"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Collected:
+    """Gauge or counter read on scrape: collect() returns (label values, value) pairs"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect():
+            if value is not None:
+                yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Registry:
+    """Metrics rendered together by /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        kind: str = "gauge"
+    ) -> Collected:
+        """Replaces an earlier registration, so owners created on startup can re-register"""
+        self._metrics.pop(name, None)
+        return self.register(Collected(name, documentation, labelnames, collect, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # One broken collector must not hide the rest of the scrape
+                lines.append(f"# {metric.name} not collected: {_escape(str(e))}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "api_http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "api_http_request_duration_seconds", "Time until the last response byte was sent", ("method", "route")
+)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "api_http_response_size_bytes", "Response body size as sent (after compression)", ("method", "route"), SIZE_BUCKETS
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "api_db_query_duration_seconds", "DataService call duration, including fetch and serialization", ("method",)
+)
+DB_QUERY_ERRORS = registry.counter(
+    "api_db_query_errors_total", "DataService calls that raised", ("method",)
+)
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    "api_db_pool_wait_seconds", "Time waiting for a free pooled connection (or opening a fallback one)", ("source",)
+)
+DB_POOL_TIMEOUTS = registry.counter(
+    "api_db_pool_timeouts_total", "Requests that gave up waiting for a pooled connection (answered 503)"
+)
+# No labels: expose 0 before the first timeout
+DB_POOL_TIMEOUTS.inc(amount=0)
+AUTH_SECONDS = registry.histogram(
+    "api_auth_verification_duration_seconds", "Bearer token verification time", ("path",)
+)
+
+
+def timed_methods(histogram: Histogram, errors: Optional[Counter] = None):
+    """Class decorator: time every public instance method, labelled by method name"""
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(attribute):
+                continue
+            setattr(cls, name, _timed(attribute, name, histogram, errors))
+        return cls
+    return decorate
+
+
+def _timed(fn, name: str, histogram: Histogram, errors: Optional[Counter]):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            if errors is not None:
+                errors.inc(name)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, name)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and response size per route template"""
+
+    def __init__(self, app: ASGIApp, excluded_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        captured = {"status": 500, "size": 0}
+
+        async def send_captured(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                captured["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_captured)
+        finally:
+            # Set by the router on match; unmatched paths share one label to bound cardinality
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, template, str(captured["status"]))
+            HTTP_LATENCY.observe(time.perf_counter() - started, method, template)
+            HTTP_RESPONSE_SIZE.observe(captured["size"], method, template)
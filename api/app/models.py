@@ -2,18 +2,19 @@
 SQLAlchemy models for the database
 """
 
-from sqlalchemy import Column, String, DateTime, JSON, Date, Text
+from sqlalchemy import Column, String, DateTime, JSON, Date, Text, Numeric, Integer, SmallInteger
 from sqlalchemy.sql import func
 from .database import Base
 
 class PipelineData(Base):
     """Model for pipeline data"""
     __tablename__ = "pipeline_data"
-    __table_args__ = {"schema": "pipeline"}
+    # One partition per data_type (db/init/06_pipeline_data_partitions.sql)
+    __table_args__ = {"schema": "pipeline", "postgresql_partition_by": "LIST (data_type)"}
     
     id = Column(String(255), primary_key=True, index=True)
     source_file = Column(String(255), nullable=False, index=True)
-    data_type = Column(String(100), nullable=False, index=True)
+    data_type = Column(String(100), primary_key=True, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     raw_data = Column(JSON)
@@ -33,6 +34,12 @@ class AuditLog(Base):
     new_data = Column(JSON)
     changed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     changed_by = Column(String(100), server_default='system')
+    # API query audit (db/init/09_audit_log.sql)
+    endpoint = Column(String(500))
+    status_code = Column(SmallInteger)
+    filters = Column(JSON)
+    row_count = Column(Integer)
+    latency_ms = Column(Numeric)
 
 class DataStatistics(Base):
     """Model for data statistics"""
@@ -46,4 +53,7 @@ class DataStatistics(Base):
     earliest_record = Column(DateTime(timezone=True))
     latest_record = Column(DateTime(timezone=True))
     quality_score = Column(String(255))
+    null_rates = Column(JSON)
+    load_duration_seconds = Column(Numeric)
+    generation = Column(DateTime(timezone=True))
     calculated_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,227 @@
+"""
+Push feed of new data generations, driven by the loader's LISTEN/NOTIFY signal,
+and cache invalidation signals shared by the API worker processes
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import orjson
+import psycopg2
+import psycopg2.extensions
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Must match CANAL_GENERACIONES in jobs/etl/extraer.py
+GENERATION_CHANNEL = "pipeline_generations"
+
+# Workers NOTIFY here after invalidating a cache so the other workers do the same
+INVALIDATION_CHANNEL = "api_cache_invalidation"
+
+# What an invalidation signal clears
+INVALIDATION_SCOPES = ("responses", "tokens", "all")
+
+
+def publish_invalidation(conn, scope: str, origin: str) -> None:
+    """NOTIFY every worker (on any host) listening on the same database"""
+    if scope not in INVALIDATION_SCOPES:
+        raise ValueError(f"Unknown invalidation scope: {scope}")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT pg_notify(%s, %s)",
+            (INVALIDATION_CHANNEL, orjson.dumps({"scope": scope, "origin": origin}).decode()),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    """Server-Sent Events frame for one generation event"""
+    return (
+        b"event: generation\n"
+        + b"id: " + str(event.get("generation")).encode("utf-8") + b"\n"
+        + b"data: " + orjson.dumps(event) + b"\n\n"
+    )
+
+
+class GenerationFeed:
+    """LISTENs on a dedicated connection and fans generation events out to subscribers"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        on_generation: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+        channel: str = GENERATION_CHANNEL,
+        listeners: Optional[Dict[str, Callable[[Dict[str, Any]], None]]] = None,
+        queue_size: int = 100,
+        reconnect_seconds: float = 5,
+        idle_seconds: float = 30,
+        keepalive_timeout_seconds: float = 10
+    ):
+        self.connect = connect
+        self.on_generation = on_generation or []
+        self.channel = channel
+        # Other channels served by the same LISTEN connection, e.g. INVALIDATION_CHANNEL
+        self.listeners = listeners or {}
+        self.queue_size = queue_size
+        self.reconnect_seconds = reconnect_seconds
+        self.idle_seconds = idle_seconds
+        self.keepalive_timeout_seconds = keepalive_timeout_seconds
+        # Last event per data_type, replayed to new subscribers
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self.events = 0
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Record an event, run the callbacks and deliver it to every subscriber"""
+        self.events += 1
+        self.latest[event.get("data_type")] = event
+        for callback in self.on_generation:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in generation callback: {str(e)}")
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Slow consumer: drop its oldest event, the newest generation matters most
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _seed(self, conn) -> None:
+        """Current generations from the loader statistics, so subscribers start with state"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT data_type, generation, record_count
+            FROM pipeline.data_statistics
+            WHERE generation IS NOT NULL
+        """)
+        for data_type, generation, record_count in cursor.fetchall():
+            self.latest.setdefault(data_type, {
+                "data_type": data_type,
+                "generation": generation.isoformat(),
+                "record_count": record_count,
+            })
+        cursor.close()
+
+    def _open(self):
+        conn = self.connect()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            self._seed(conn)
+        except Exception as e:
+            logger.error(f"Error reading current generations: {str(e)}")
+        cursor = conn.cursor()
+        for channel in (self.channel, *self.listeners):
+            cursor.execute(f"LISTEN {channel}")
+        cursor.close()
+        return conn
+
+    @staticmethod
+    def _keepalive(conn) -> None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+
+    def _handle(self, channel: str, payload: str) -> None:
+        try:
+            event = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.error(f"Ignoring malformed {channel} payload: {payload[:200]}")
+            return
+        if channel == self.channel:
+            self.publish(event)
+            return
+        try:
+            self.listeners[channel](event)
+        except Exception as e:
+            logger.error(f"Error in {channel} listener: {str(e)}")
+
+    async def run(self) -> None:
+        """Listen until cancelled, reconnecting after connection errors"""
+        loop = asyncio.get_running_loop()
+        while True:
+            conn = None
+            try:
+                conn = await run_in_threadpool(self._open)
+                self.connected = True
+                self.last_error = None
+                readable = asyncio.Event()
+                loop.add_reader(conn.fileno(), readable.set)
+                try:
+                    while True:
+                        try:
+                            await asyncio.wait_for(readable.wait(), timeout=self.idle_seconds)
+                        except asyncio.TimeoutError:
+                            # Idle: make sure the connection is still alive, in the
+                            # threadpool so a hung connection cannot block the loop
+                            try:
+                                await asyncio.wait_for(
+                                    run_in_threadpool(self._keepalive, conn),
+                                    timeout=self.keepalive_timeout_seconds
+                                )
+                            except asyncio.TimeoutError:
+                                raise ConnectionError(
+                                    f"Keepalive timed out after {self.keepalive_timeout_seconds} s"
+                                ) from None
+                        readable.clear()
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            self._handle(notify.channel, notify.payload)
+                finally:
+                    loop.remove_reader(conn.fileno())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Generation listener error: {str(e)}")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.closed:
+                    # A timed-out keepalive may still hold the connection; close()
+                    # waits for it, so it runs in the executor without blocking the loop
+                    loop.run_in_executor(None, conn.close)
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        """Listener state for /health"""
+        return {
+            "enabled": True,
+            "connected": self.connected,
+            "channels": [self.channel, *self.listeners],
+            "subscribers": len(self._subscribers),
+            "events": self.events,
+            "generations": {data_type: event.get("generation") for data_type, event in self.latest.items()},
+            "error": self.last_error,
+        }
@@ -0,0 +1,248 @@
+"""
+Slow-query log: statements run through execute_statement above a threshold are
+logged with their shape and parameters, and a sample of them is re-run under
+EXPLAIN (ANALYZE, BUFFERS) by a background task into pipeline.slow_query_plans
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Deque, Dict, List, Optional
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from .statements import shape_name
+
+logger = logging.getLogger(__name__)
+
+# Characters of the parameter list kept in the log line and the recent list
+_PARAMS_MAX_CHARS = 1000
+
+_INSERT_SQL = """
+    INSERT INTO pipeline.slow_query_plans (shape, query, params, duration_ms, explain_ms, plan)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def _param(value: Any) -> Any:
+    """JSON-friendly parameter value"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_param(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class SlowQueryLog:
+    """Logs statements slower than threshold_ms and samples them for EXPLAIN ANALYZE"""
+
+    def __init__(
+        self,
+        connection_factory,
+        threshold_ms: float = 500,
+        explain_enabled: bool = True,
+        explain_sample_rate: float = 0.1,
+        explain_min_interval_seconds: float = 300,
+        explain_queue_size: int = 100,
+        explain_timeout_seconds: float = 30,
+        poll_seconds: float = 1,
+        recent_size: int = 200
+    ):
+        self.connection_factory = connection_factory
+        self.threshold_ms = threshold_ms
+        self.explain_enabled = explain_enabled
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_min_interval_seconds = explain_min_interval_seconds
+        self.explain_queue_size = explain_queue_size
+        self.explain_timeout_seconds = explain_timeout_seconds
+        self.poll_seconds = poll_seconds
+        self.statements = 0
+        self.slow = 0
+        self.explained = 0
+        self.explain_skipped = 0
+        self.explain_failed = 0
+        self.last_error: Optional[str] = None
+        # Statements arrive from threadpool workers
+        self._lock = threading.Lock()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent_size)
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._last_explained: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, query: str, params: tuple, seconds: float) -> None:
+        """Statement hook for execute_statement; never raises into the query path"""
+        try:
+            self._observe(query, params, seconds)
+        except Exception as e:
+            logger.error(f"Error recording slow query: {str(e)}")
+
+    def _observe(self, query: str, params: tuple, seconds: float) -> None:
+        duration_ms = seconds * 1000
+        with self._lock:
+            self.statements += 1
+            if duration_ms < self.threshold_ms:
+                return
+            self.slow += 1
+
+        shape = shape_name(query)
+        params_json = [_param(value) for value in params]
+        params_text = orjson.dumps(params_json).decode()[:_PARAMS_MAX_CHARS]
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "shape": shape,
+            "duration_ms": round(duration_ms, 3),
+            "query": " ".join(query.split()),
+            "params": params_text,
+        }
+        logger.warning(f"Slow query {shape} {duration_ms:.1f} ms: {entry['query'][:500]} params={params_text}")
+
+        with self._lock:
+            self._recent.append(entry)
+            if not self._should_explain(shape):
+                return
+            self._last_explained[shape] = time.monotonic()
+            self._pending.append({
+                "shape": shape,
+                "query": query,
+                "params": params,
+                "params_json": params_json,
+                "duration_ms": duration_ms,
+            })
+
+    def _should_explain(self, shape: str) -> bool:
+        """Called with the lock held"""
+        if not self.explain_enabled or random.random() >= self.explain_sample_rate:
+            return False
+        last = self._last_explained.get(shape)
+        if last is not None and time.monotonic() - last < self.explain_min_interval_seconds:
+            return False
+        if len(self._pending) >= self.explain_queue_size:
+            self.explain_skipped += 1
+            return False
+        return True
+
+    def explain(self, item: Dict[str, Any]) -> bool:
+        """Re-run one statement under EXPLAIN (ANALYZE, BUFFERS) and store the plan"""
+        query = item["query"].strip()
+        if query.split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+            # ANALYZE executes the statement; only read queries are re-run
+            return False
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(self.explain_timeout_seconds * 1000),))
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", item["params"])
+                plan = cursor.fetchone()[0]
+                conn.rollback()
+                if isinstance(plan, str):
+                    plan = orjson.loads(plan)
+                explain_ms = plan[0].get("Execution Time") if plan else None
+                cursor.execute(_INSERT_SQL, (
+                    item["shape"],
+                    query,
+                    orjson.dumps(item["params_json"]).decode(),
+                    round(item["duration_ms"], 3),
+                    explain_ms,
+                    orjson.dumps(plan).decode(),
+                ))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return True
+
+    async def flush(self) -> None:
+        """Explain every pending statement, one at a time"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                item = self._pending.popleft()
+            try:
+                if await run_in_threadpool(self.explain, item):
+                    self.explained += 1
+                else:
+                    self.explain_skipped += 1
+                self.last_error = None
+            except Exception as e:
+                self.explain_failed += 1
+                self.last_error = str(e)
+                logger.error(f"Error capturing plan for slow query {item['shape']}: {str(e)}")
+
+    async def run(self) -> None:
+        """Capture pending plans every poll_seconds"""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background task; pending plans are dropped (they re-run the query)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def recent(self, limit: int = 50, shape: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent slow statements, newest first"""
+        with self._lock:
+            entries = list(self._recent)
+        entries.reverse()
+        if shape:
+            entries = [entry for entry in entries if entry["shape"] == shape]
+        return entries[:limit]
+
+    def plans(self, limit: int = 20, shape: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Captured plans from pipeline.slow_query_plans, newest first"""
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT id, captured_at, shape, query, params, duration_ms, explain_ms, plan
+                    FROM pipeline.slow_query_plans
+                    {"WHERE shape = %s" if shape else ""}
+                    ORDER BY captured_at DESC
+                    LIMIT %s
+                """, (shape, limit) if shape else (limit,))
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                conn.rollback()
+            finally:
+                cursor.close()
+        for row in rows:
+            row["duration_ms"] = float(row["duration_ms"])
+            row["explain_ms"] = float(row["explain_ms"]) if row["explain_ms"] is not None else None
+        return rows
+
+    def status(self) -> Dict[str, Any]:
+        """Counters for /health"""
+        with self._lock:
+            return {
+                "enabled": True,
+                "threshold_ms": self.threshold_ms,
+                "statements": self.statements,
+                "slow": self.slow,
+                "explain_pending": len(self._pending),
+                "explained": self.explained,
+                "explain_skipped": self.explain_skipped,
+                "explain_failed": self.explain_failed,
+                "error": self.last_error,
+            }
@@ -0,0 +1,503 @@
+"""
+In-memory columnar replica of the calidad producto terminado dataset
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+from starlette.concurrency import run_in_threadpool
+
+from .columnar import build_column
+from .schemas import FilterCondition
+from .datasets import CALIDAD_DATASET, TYPED_FILTER_FIELDS
+from .services import PROCESSED_META_KEYS, _expanded_processed_data, _filter_clause, _generation_join, _typed_value
+
+logger = logging.getLogger(__name__)
+
+# Dictionary-encoded columns with an inverted index (value -> row positions)
+VALUE_INDEXED_COLUMNS = ("EMPRESA", "N° FCL")
+
+# Timestamp columns with a sorted index for range predicates
+SORTED_INDEXED_COLUMNS = ("FECHA DE MP", "FECHA DE PROCESO", "created_at")
+
+# ILIKE pattern characters: the SQL path passes filters and empresa to ILIKE as
+# given, so values containing them are patterns, not substrings
+_LIKE_SPECIAL = ("%", "_", "\\")
+
+_MICROSECONDS_PER_DAY = 86400 * 10**6
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ReplicaUnsupported(Exception):
+    """The request uses a predicate the replica cannot answer exactly; use Postgres"""
+
+
+def _day_start(value: date) -> int:
+    """Microseconds since epoch at midnight of a (naive, wall-clock) date"""
+    return (value - date(1970, 1, 1)).days * _MICROSECONDS_PER_DAY
+
+
+def _canonical_iso(value: Any) -> bool:
+    """True if value is exactly how datetime.isoformat() writes the naive datetime it parses to"""
+    if not isinstance(value, str):
+        return False
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return parsed.tzinfo is None and parsed.isoformat() == value
+
+
+def _instant(value: datetime) -> int:
+    """Microseconds since epoch of a datetime; naive values are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class _ValueIndex:
+    """Inverted index over a dictionary-encoded column (CSR layout)"""
+
+    def __init__(self, column: pa.DictionaryArray):
+        codes = column.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+        order = np.argsort(codes, kind="stable")
+        valid = codes[order] >= 0
+        self.order = order[valid]
+        counts = np.bincount(codes[codes >= 0], minlength=len(column.dictionary))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def positions(self, codes: np.ndarray) -> np.ndarray:
+        """Row positions holding any of the given dictionary codes"""
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes])
+
+    @property
+    def nbytes(self) -> int:
+        return self.order.nbytes + self.offsets.nbytes
+
+
+class _SortedIndex:
+    """Sorted index over a timestamp column for range lookups"""
+
+    def __init__(self, column: pa.Array):
+        valid = column.is_valid().to_numpy(zero_copy_only=False)
+        values = column.cast(pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+        positions = np.flatnonzero(valid)
+        order = np.argsort(values[positions], kind="stable")
+        self.positions = positions[order]
+        self.values = values[self.positions]
+
+    def range(self, low: Optional[int], high: Optional[int]) -> np.ndarray:
+        """Row positions with low <= value < high (None = unbounded)"""
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        end = len(self.values) if high is None else np.searchsorted(self.values, high, side="left")
+        return self.positions[start:end]
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.values.nbytes
+
+
+class CalidadReplica:
+    """Immutable columnar snapshot of one calidad producto terminado generation"""
+
+    def __init__(self, generation: Optional[datetime], payloads: List[str], data: List[Dict[str, Any]],
+                 created_at: List[datetime]):
+        self.generation = generation
+        self.num_rows = len(payloads)
+        self.loaded_at = datetime.now(timezone.utc)
+        # Rows are kept pre-serialized in response order (created_at DESC, id)
+        self.payloads = pa.array(payloads, type=pa.large_string())
+        self.columns: Dict[str, pa.Array] = {}
+        self.mixed_columns: Set[str] = set()
+        # Timestamp columns whose stored strings are all canonical ISO (see _match_mask)
+        self.canonical_timestamp_columns: Set[str] = set()
+
+        names: Dict[str, None] = {}
+        for row in data:
+            for key in row:
+                names.setdefault(key, None)
+        for name in names:
+            values = [row.get(name) for row in data]
+            kinds = {type(v) for v in values if v is not None}
+            if len(kinds - {int, float}) > 1 or ((kinds & {int, float}) and kinds - {int, float}):
+                self.mixed_columns.add(name)
+            column = build_column(name, values)
+            if pa.types.is_timestamp(column.type) and all(v is None or _canonical_iso(v) for v in values):
+                self.canonical_timestamp_columns.add(name)
+            if pa.types.is_string(column.type):
+                column = pc.dictionary_encode(column)
+            self.columns[name] = column
+        self.columns["created_at"] = pa.array(created_at, type=pa.timestamp("us", tz="UTC"))
+
+        self.value_indexes = {
+            name: _ValueIndex(self.columns[name])
+            for name in VALUE_INDEXED_COLUMNS
+            if name in self.columns and pa.types.is_dictionary(self.columns[name].type)
+        }
+        self.sorted_indexes = {
+            name: _SortedIndex(self.columns[name])
+            for name in SORTED_INDEXED_COLUMNS
+            if name in self.columns and pa.types.is_timestamp(self.columns[name].type)
+        }
+        self._codes: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, db) -> "CalidadReplica":
+        """Load the current generation from Postgres"""
+        cursor = db.cursor()
+        # processed_data is rebuilt to the response shape once, at load time
+        cursor.execute(f"""
+            SELECT
+                json_build_object(
+                    'id', p.id,
+                    'source_file', p.source_file,
+                    'created_at', p.created_at,
+                    'updated_at', p.updated_at,
+                    'processed_data', {_expanded_processed_data(CALIDAD_DATASET, "p")}
+                )::text,
+                p.created_at
+            FROM pipeline.pipeline_data p{_generation_join(CALIDAD_DATASET, "p")}
+            WHERE p.data_type = 'calidad_producto_terminado'
+            ORDER BY p.created_at DESC, p.id
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        payloads = [row[0] for row in rows]
+        created_at = [row[1] for row in rows]
+        data = [(orjson.loads(payload)["processed_data"] or {}).get("data") or {} for payload in payloads]
+        generation = max(created_at) if created_at else None
+        return cls(generation, payloads, data, created_at)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the replica"""
+        total = self.payloads.nbytes + sum(column.nbytes for column in self.columns.values())
+        total += sum(index.nbytes for index in self.value_indexes.values())
+        total += sum(index.nbytes for index in self.sorted_indexes.values())
+        return total
+
+    # Predicates -------------------------------------------------------------
+
+    def _positions_mask(self, positions: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _column(self, name: str) -> Optional[pa.Array]:
+        if name in self.mixed_columns:
+            raise ReplicaUnsupported(f"Column {name} mixes value types")
+        return self.columns.get(name)
+
+    def _dictionary_mask(self, name: str, predicate: Callable[[pa.Array], pa.Array]) -> np.ndarray:
+        """Evaluate a string predicate on the dictionary, then map it to rows"""
+        column = self._column(name)
+        if column is None:
+            return np.zeros(self.num_rows, dtype=bool)
+        if not pa.types.is_dictionary(column.type):
+            raise ReplicaUnsupported(f"Column {name} is not a text column")
+        selected = np.flatnonzero(predicate(column.dictionary).fill_null(False).to_numpy(zero_copy_only=False))
+        index = self.value_indexes.get(name)
+        if index is not None:
+            return self._positions_mask(index.positions(selected))
+        codes = self._codes.get(name)
+        if codes is None:
+            codes = column.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+            self._codes[name] = codes
+        return np.isin(codes, selected)
+
+    def _numeric_values(self, name: str) -> Optional[np.ndarray]:
+        column = self._column(name)
+        if column is None:
+            return None
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+            raise ReplicaUnsupported(f"Column {name} is not numeric")
+        return column.cast(pa.float64()).fill_null(np.nan).to_numpy(zero_copy_only=False)
+
+    def _range_mask(self, name: str, low: Optional[int], high: Optional[int]) -> np.ndarray:
+        index = self.sorted_indexes.get(name)
+        if index is None:
+            if self._column(name) is None:
+                return np.zeros(self.num_rows, dtype=bool)
+            raise ReplicaUnsupported(f"Column {name} is not a date column")
+        return self._positions_mask(index.range(low, high))
+
+    def _substring_mask(self, name: str, value: str) -> np.ndarray:
+        """Case-insensitive substring filter, as ILIKE '%value%' without pattern characters"""
+        if any(char in value for char in _LIKE_SPECIAL):
+            raise ReplicaUnsupported(f"Filter value for {name} contains an ILIKE pattern character")
+        return self._dictionary_mask(name, lambda d: pc.match_substring(d, value, ignore_case=True))
+
+    def _match_mask(self, key: str, value: Any) -> np.ndarray:
+        """Exact JSON match for one key, as processed_data->'data' @> {key: value}"""
+        column = self._column(key)
+        if column is None:
+            return np.zeros(self.num_rows, dtype=bool)
+        if isinstance(value, str):
+            if pa.types.is_timestamp(column.type):
+                # @> compares the stored ISO string, not the instant. When every stored
+                # string is canonical, only a canonical value can equal one of them, and
+                # equal canonical strings are equal instants
+                if key not in self.canonical_timestamp_columns:
+                    raise ReplicaUnsupported(f"Column {key} stores dates in more than one format")
+                if not _canonical_iso(value):
+                    return np.zeros(self.num_rows, dtype=bool)
+                instant = _instant(datetime.fromisoformat(value))
+                return self._range_mask(key, instant, instant + 1)
+            if pa.types.is_dictionary(column.type):
+                return self._dictionary_mask(key, lambda values: pc.equal(values, value))
+            return np.zeros(self.num_rows, dtype=bool)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+                return self._numeric_values(key) == value
+            return np.zeros(self.num_rows, dtype=bool)
+        raise ReplicaUnsupported(f"Match value for {key} is not a scalar string or number")
+
+    def _condition_mask(self, condition: FilterCondition) -> np.ndarray:
+        """Evaluate one typed filter condition with the same semantics as the SQL compiler"""
+        _, pg_type = TYPED_FILTER_FIELDS[condition.field]
+        field, op = condition.field, condition.op
+        value = _typed_value(field, pg_type, condition.value) if condition.value is not None else None
+        values = [_typed_value(field, pg_type, v) for v in condition.values] if condition.values else None
+
+        if pg_type == "text":
+            if op == "eq":
+                return self._dictionary_mask(field, lambda d: pc.equal(d, value))
+            if op == "in":
+                return self._dictionary_mask(field, lambda d: pc.is_in(d, value_set=pa.array(values, pa.string())))
+            if op == "prefix":
+                return self._dictionary_mask(field, lambda d: pc.starts_with(d, pattern=value))
+            # Text ranges follow the database collation (en_US.utf8 in docker-compose),
+            # while Arrow compares UTF-8 bytes
+            raise ReplicaUnsupported(f"'{op}' on text field {field} depends on the database collation")
+
+        if pg_type == "numeric":
+            numbers = self._numeric_values(field)
+            if numbers is None:
+                return np.zeros(self.num_rows, dtype=bool)
+            with np.errstate(invalid="ignore"):
+                if op == "eq":
+                    return numbers == value
+                if op == "in":
+                    return np.isin(numbers, values)
+                if op == "gte":
+                    return numbers >= value
+                if op == "lte":
+                    return numbers <= value
+                if op == "between":
+                    return (numbers >= values[0]) & (numbers <= values[1])
+            raise ReplicaUnsupported(f"'{op}' is not supported on {field}")
+
+        if pg_type == "date":
+            # iso_date() keeps the calendar day, so compare whole days
+            if op == "eq":
+                return self._range_mask(field, _day_start(value), _day_start(value) + _MICROSECONDS_PER_DAY)
+            if op == "in":
+                mask = np.zeros(self.num_rows, dtype=bool)
+                for day in values:
+                    mask |= self._range_mask(field, _day_start(day), _day_start(day) + _MICROSECONDS_PER_DAY)
+                return mask
+            if op == "gte":
+                return self._range_mask(field, _day_start(value), None)
+            if op == "lte":
+                return self._range_mask(field, None, _day_start(value) + _MICROSECONDS_PER_DAY)
+            if op == "between":
+                return self._range_mask(field, _day_start(values[0]), _day_start(values[1]) + _MICROSECONDS_PER_DAY)
+            raise ReplicaUnsupported(f"'{op}' is not supported on {field}")
+
+        # timestamptz (created_at)
+        if op == "eq":
+            return self._range_mask(field, _instant(value), _instant(value) + 1)
+        if op == "in":
+            mask = np.zeros(self.num_rows, dtype=bool)
+            for instant in values:
+                mask |= self._range_mask(field, _instant(instant), _instant(instant) + 1)
+            return mask
+        if op == "gte":
+            return self._range_mask(field, _instant(value), None)
+        if op == "lte":
+            return self._range_mask(field, None, _instant(value) + 1)
+        if op == "between":
+            return self._range_mask(field, _instant(values[0]), _instant(values[1]) + 1)
+        raise ReplicaUnsupported(f"'{op}' is not supported on {field}")
+
+    # Queries ----------------------------------------------------------------
+
+    def matching(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        empresa: Optional[str] = None
+    ) -> np.ndarray:
+        """Positions of every matching row, in response order"""
+        # Same whitelist and operand validation as the SQL path
+        _filter_clause(filters, match, where)
+
+        mask = np.ones(self.num_rows, dtype=bool)
+        for condition in where or []:
+            mask &= self._condition_mask(condition)
+        for key, value in (filters or {}).items():
+            if value is not None:
+                mask &= self._substring_mask(key, str(value))
+        for key, value in (match or {}).items():
+            mask &= self._match_mask(key, value)
+        if empresa:
+            mask &= self._substring_mask("EMPRESA", empresa)
+
+        return np.flatnonzero(mask)
+
+    def select(self, limit: Optional[int] = None, offset: int = 0, **kwargs) -> np.ndarray:
+        """Row positions of one page, in response order"""
+        positions = self.matching(**kwargs)
+        offset = offset or 0
+        return positions[offset:offset + limit] if limit else positions[offset:]
+
+    def page_json(self, positions: np.ndarray, fields: Optional[List[str]] = None) -> bytes:
+        """Serialize a page with the same shape as DataService.get_calidad_producto_terminado_json"""
+        rows = self.payloads.take(pa.array(positions, type=pa.int64())).to_pylist()
+        if fields:
+            data_keys = [f for f in fields if f not in PROCESSED_META_KEYS]
+            projected_rows = []
+            for payload in rows:
+                row = orjson.loads(payload)
+                processed = row["processed_data"] or {}
+                data = processed.get("data") or {}
+                projection = {key: processed.get(key) for key in PROCESSED_META_KEYS if key in fields}
+                # As pipeline.jsonb_pick: keys absent from the row are left out, not null
+                projection["data"] = {key: value for key, value in data.items() if key in data_keys}
+                row["processed_data"] = projection
+                projected_rows.append(orjson.dumps(row).decode("utf-8"))
+            rows = projected_rows
+        return ("[" + ",".join(rows) + "]").encode("utf-8")
+
+    def query_json(self, fields: Optional[List[str]] = None, **kwargs) -> bytes:
+        """Filter, paginate and serialize a page"""
+        return self.page_json(self.select(**kwargs), fields)
+
+    def query_page_json(
+        self,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        **kwargs
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """Serialized page plus the same total/has_more metadata as DataService; totals are always exact"""
+        positions = self.matching(**kwargs)
+        offset = offset or 0
+        page = positions[offset:offset + limit] if limit else positions[offset:]
+        meta = {
+            "total": int(len(positions)),
+            "total_is_estimate": False,
+            "has_more": bool(limit) and offset + len(page) < len(positions),
+            "returned": int(len(page)),
+        }
+        return self.page_json(page, fields), meta
+
+
+class ReplicaManager:
+    """Holds the current replica and swaps it when the ETL loads a new generation"""
+
+    def __init__(self, connection_factory, refresh_seconds: float = 30, on_swap: Optional[Callable[[], None]] = None):
+        self.connection_factory = connection_factory
+        self.refresh_seconds = refresh_seconds
+        self.on_swap = on_swap
+        self.replica: Optional[CalidadReplica] = None
+        self.last_error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def current_generation(db) -> Optional[datetime]:
+        """created_at of the current load; every row of a load shares it"""
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT created_at
+            FROM pipeline.pipeline_data
+            WHERE data_type = 'calidad_producto_terminado'
+            ORDER BY created_at DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        cursor.close()
+        return row[0] if row else None
+
+    def refresh(self) -> bool:
+        """Reload the replica if the generation changed; returns True when swapped"""
+        # Poll loop and push notifications may race; the second caller sees the new generation
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        with self.connection_factory() as conn:
+            generation = self.current_generation(conn)
+            if self.replica is not None and self.replica.generation == generation:
+                return False
+            started = time.perf_counter()
+            replica = CalidadReplica.load(conn)
+        self.load_seconds = time.perf_counter() - started
+        # Readers hold a reference to the old replica; the swap itself is a single assignment
+        self.replica = replica
+        logger.info(f"Calidad replica loaded: {replica.num_rows} rows, generation {replica.generation}")
+        if self.on_swap:
+            self.on_swap()
+        return True
+
+    async def run(self) -> None:
+        """Poll for new generations until cancelled"""
+        while True:
+            try:
+                await run_in_threadpool(self.refresh)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error refreshing calidad replica: {str(e)}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def refresh_now(self) -> None:
+        """Refresh right away (e.g. when the loader announces a generation)"""
+        try:
+            await run_in_threadpool(self.refresh)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error refreshing calidad replica: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        """Replica state for /health"""
+        replica = self.replica
+        if replica is None:
+            return {"enabled": True, "loaded": False, "error": self.last_error}
+        return {
+            "enabled": True,
+            "loaded": True,
+            "generation": replica.generation.isoformat() if replica.generation else None,
+            "rows": replica.num_rows,
+            "memory_bytes": replica.nbytes,
+            "loaded_at": replica.loaded_at.isoformat(),
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.last_error,
+        }
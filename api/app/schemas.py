@@ -2,9 +2,9 @@
 Pydantic schemas for API request/response models
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, List, Literal
+from datetime import datetime, date
 
 class DataResponse(BaseModel):
     """Response model for pipeline data"""
@@ -126,17 +126,93 @@ class CalidadProductoTerminado(BaseModel):
     class Config:
         from_attributes = True
 
+class FilterCondition(BaseModel):
+    """Typed filter condition, compiled by DataService to a parameterized SQL predicate"""
+    field: str = Field(..., description="Columna a filtrar (ej. 'PRODUCTOR', 'FECHA DE PROCESO')")
+    op: Literal["eq", "in", "gte", "lte", "between", "prefix"]
+    value: Optional[Any] = Field(default=None, description="Valor para eq, gte, lte y prefix")
+    values: Optional[List[Any]] = Field(default=None, description="Lista para in, o [desde, hasta] para between")
+
+    @model_validator(mode="after")
+    def check_operands(self):
+        """Validate that the operands match the operator"""
+        if self.op == "in":
+            if not self.values:
+                raise ValueError("'in' requires a non-empty 'values' list")
+        elif self.op == "between":
+            if not self.values or len(self.values) != 2:
+                raise ValueError("'between' requires 'values' with exactly two items")
+        elif self.value is None:
+            raise ValueError(f"'{self.op}' requires 'value'")
+        return self
+
 class CalidadProductoTerminadoRequest(BaseModel):
     """Request model for calidad producto terminado queries"""
     limit: Optional[int] = None
     offset: Optional[int] = 0
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="Búsqueda parcial (ILIKE) por columna")
+    match: Optional[Dict[str, Any]] = Field(default=None, description="Coincidencia exacta por columna (valor con el mismo tipo JSON)")
+    where: Optional[List[FilterCondition]] = Field(default=None, description="Condiciones tipadas combinadas con AND")
+    fields: Optional[List[str]] = Field(default=None, description="Claves a devolver en processed_data (todas si se omite)")
+    envelope: bool = Field(default=False, description="Devolver {data, total, has_more, timing} en lugar de la lista")
+    count: Literal["exact", "estimated", "none"] = Field(default="exact", description="Cálculo de total en el envelope: exacto, estimado por el planificador o ninguno")
+    as_of: Optional[datetime] = Field(default=None, description="Generación (o instante) a consultar dentro de la ventana de retención; la vigente si se omite")
 
 class CalidadProductoTerminadoEmpresaRequest(BaseModel):
     """Request model for filtering calidad producto terminado by empresa"""
     empresa: str = Field(..., description="Nombre de la empresa para filtrar los datos")
     limit: Optional[int] = None
     offset: Optional[int] = 0
+    fields: Optional[List[str]] = Field(default=None, description="Claves a devolver en processed_data (todas si se omite)")
+    envelope: bool = Field(default=False, description="Devolver {data, total, has_more, timing} en lugar de la lista")
+    count: Literal["exact", "estimated", "none"] = Field(default="exact", description="Cálculo de total en el envelope: exacto, estimado por el planificador o ninguno")
+    as_of: Optional[datetime] = Field(default=None, description="Generación (o instante) a consultar dentro de la ventana de retención; la vigente si se omite")
+
+class CalidadProductoTerminadoBatchQuery(CalidadProductoTerminadoRequest):
+    """One named sub-query of a batch request"""
+    limit: Optional[int] = Field(default=None, description="Tamaño de página (max_page_size si se omite o lo supera)")
+    empresa: Optional[str] = Field(default=None, description="Nombre de la empresa para filtrar los datos")
+
+class CalidadProductoTerminadoBatchRequest(BaseModel):
+    """Request model for several calidad producto terminado queries in one call"""
+    queries: Dict[str, CalidadProductoTerminadoBatchQuery] = Field(
+        ..., min_length=1, max_length=20,
+        description="Sub-consultas por nombre (ej. {'blue_gold': {...}, 'san_lucar': {...}})"
+    )
+
+class CalidadProductoTerminadoExportRequest(BaseModel):
+    """Request model for columnar (Arrow/Parquet) exports of calidad producto terminado"""
+    format: Literal["arrow", "parquet"] = Field(default="arrow", description="arrow = Arrow IPC stream, parquet = Parquet file")
+    columns: Optional[List[str]] = Field(default=None, description="Columnas a exportar (todas si se omite)")
+    filters: Optional[Dict[str, Any]] = None
+    match: Optional[Dict[str, Any]] = None
+    where: Optional[List[FilterCondition]] = None
+    empresa: Optional[str] = None
+    limit: Optional[int] = None
+    offset: Optional[int] = 0
+
+class DatasetRequest(BaseModel):
+    """Request model for the generic /api/v1/data/{data_type} endpoint"""
+    limit: Optional[int] = Field(default=None, description="Tamaño de página (default_page_size si se omite, máximo max_page_size)")
+    offset: Optional[int] = 0
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="Búsqueda parcial (ILIKE) por columna")
+    match: Optional[Dict[str, Any]] = Field(default=None, description="Coincidencia exacta por columna (valor con el mismo tipo JSON)")
+    where: Optional[List[FilterCondition]] = Field(default=None, description="Condiciones tipadas combinadas con AND")
+    fields: Optional[List[str]] = Field(default=None, description="Claves a devolver en processed_data (todas si se omite)")
+    envelope: bool = Field(default=False, description="Devolver {data, total, has_more, timing} en lugar de la lista")
+    count: Literal["exact", "estimated", "none"] = Field(default="exact", description="Cálculo de total en el envelope: exacto, estimado por el planificador o ninguno")
+    as_of: Optional[datetime] = Field(default=None, description="Generación (o instante) a consultar dentro de la ventana de retención; la vigente si se omite")
+
+CalidadDimension = Literal["EMPRESA", "PRODUCTOR", "VARIEDAD", "DESTINO", "PRESENTACION", "TURNO"]
+
+class CalidadProductoTerminadoAggregateRequest(BaseModel):
+    """Request model for server-side aggregations of calidad producto terminado"""
+    group_by: List[CalidadDimension] = Field(default_factory=list, description="Dimensiones de agrupación")
+    date_bucket: Optional[Literal["day", "week", "month", "year"]] = Field(default=None, description="Agrupar por FECHA DE PROCESO truncada")
+    metrics: List[str] = Field(default_factory=list, description="Columnas numéricas a resumir (avg, sum, min, max)")
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    filters: Optional[Dict[CalidadDimension, str]] = Field(default=None, description="Coincidencia exacta por dimensión")
 
 class UserLogin(BaseModel):
     """User login model"""
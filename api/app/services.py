@@ -2,14 +2,291 @@
 Service layer for business logic and database operations
 """
 
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime, timedelta
 import logging
 
-from .schemas import CalidadProductoTerminado
+import orjson
+import pyarrow as pa
+
+from .schemas import CalidadProductoTerminado, FilterCondition
+from .columnar import CALIDAD_META_COLUMNS, build_calidad_table
+from .datasets import CALIDAD_DATASET, TYPED_FILTER_FIELDS, Dataset
+from .statements import execute_statement
+from .metrics import DB_QUERY_ERRORS, DB_QUERY_SECONDS, timed_methods
 
 logger = logging.getLogger(__name__)
 
+# Materialized view columns behind each aggregation dimension
+AGGREGATION_DIMENSIONS = {
+    "EMPRESA": "empresa",
+    "PRODUCTOR": "productor",
+    "VARIEDAD": "variedad",
+    "DESTINO": "destino",
+    "PRESENTACION": "presentacion",
+    "TURNO": "turno",
+}
+
+# date_trunc fields accepted as aggregation date buckets
+AGGREGATION_DATE_BUCKETS = ("day", "week", "month", "year")
+
+def _typed_value(field: str, pg_type: str, value: Any) -> Any:
+    """Validate a DSL operand against the field type"""
+    try:
+        if pg_type == "numeric":
+            if isinstance(value, bool):
+                raise ValueError
+            return float(value) if not isinstance(value, int) else value
+        if pg_type == "date":
+            return date.fromisoformat(str(value)[:10])
+        if pg_type == "timestamptz":
+            return datetime.fromisoformat(str(value))
+        return str(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {pg_type} value for {field}: {value!r}")
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so prefix filters match literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _where_clause(
+    conditions: Optional[List[FilterCondition]],
+    typed_fields: Dict[str, Tuple[str, str]] = TYPED_FILTER_FIELDS
+) -> Tuple[str, List[Any]]:
+    """Compile typed filter conditions into a parameterized SQL clause"""
+    clause = ""
+    params: List[Any] = []
+    for condition in conditions or []:
+        if condition.field not in typed_fields:
+            raise ValueError(f"Filter field not allowed: {condition.field}")
+        expr, pg_type = typed_fields[condition.field]
+        if condition.op == "eq":
+            clause += f" AND {expr} = %s::{pg_type}"
+            params.append(_typed_value(condition.field, pg_type, condition.value))
+        elif condition.op == "in":
+            clause += f" AND {expr} = ANY(%s::{pg_type}[])"
+            params.append([_typed_value(condition.field, pg_type, v) for v in condition.values])
+        elif condition.op == "gte":
+            clause += f" AND {expr} >= %s::{pg_type}"
+            params.append(_typed_value(condition.field, pg_type, condition.value))
+        elif condition.op == "lte":
+            clause += f" AND {expr} <= %s::{pg_type}"
+            params.append(_typed_value(condition.field, pg_type, condition.value))
+        elif condition.op == "between":
+            clause += f" AND {expr} BETWEEN %s::{pg_type} AND %s::{pg_type}"
+            params.extend(_typed_value(condition.field, pg_type, v) for v in condition.values)
+        elif condition.op == "prefix":
+            if pg_type != "text":
+                raise ValueError(f"'prefix' is only supported on text fields, not {condition.field}")
+            clause += f" AND {expr} LIKE %s"
+            params.append(_escape_like(str(condition.value)) + "%")
+    return clause, params
+
+def _filter_clause(
+    filters: Optional[Dict[str, Any]] = None,
+    match: Optional[Dict[str, Any]] = None,
+    where: Optional[List[FilterCondition]] = None,
+    dataset: Dataset = CALIDAD_DATASET
+) -> Tuple[str, List[Any]]:
+    """Build the SQL filter clause for substring filters, exact matches and typed conditions"""
+    clause, params = _where_clause(where, dataset.typed_fields)
+    if filters:
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key not in dataset.text_filter_keys:
+                raise ValueError(f"Filter key not allowed: {key}")
+            # Key comes from the whitelist so the expression matches its trigram index
+            clause += f" AND processed_data->'data'->>'{dataset.storage_key(key)}' ILIKE %s"
+            params.append(f"%{value}%")
+    if match:
+        for key in match:
+            if key not in dataset.match_keys:
+                raise ValueError(f"Match key not allowed: {key}")
+        clause += " AND processed_data->'data' @> %s::jsonb"
+        params.append(orjson.dumps({dataset.storage_key(key): value for key, value in match.items()}).decode())
+    return clause, params
+
+# processed_data keys of the response next to the spreadsheet columns; in the
+# compact storage format they are rebuilt from the row and its generation
+PROCESSED_META_KEYS = ("record_id", "row_index", "processed_at")
+
+def _column_names_sql(dataset: Dataset) -> str:
+    """Short key -> column name map; an uncorrelated subquery, evaluated once per query"""
+    return (
+        "(SELECT jsonb_object_agg(short_key, column_name) FROM pipeline.data_columns "
+        f"WHERE data_type = '{dataset.data_type}')"
+    )
+
+def _short_keys_sql(dataset: Dataset) -> str:
+    """Short keys of the column names bound to the following parameter, once per query"""
+    return (
+        "ARRAY(SELECT short_key FROM pipeline.data_columns "
+        f"WHERE data_type = '{dataset.data_type}' AND column_name = ANY(%s::text[]))"
+    )
+
+def _compact_data_projection(keys: Optional[List[str]], dataset: Dataset) -> Tuple[str, List[Any]]:
+    """processed_data->'data' limited to the requested columns, still with short keys"""
+    if keys is None:
+        return "processed_data->'data'", []
+    if not keys:
+        return "'{}'::jsonb", []
+    return f"pipeline.jsonb_pick(processed_data->'data', {_short_keys_sql(dataset)})", [list(keys)]
+
+def _data_projection(keys: Optional[List[str]], dataset: Dataset = CALIDAD_DATASET) -> Tuple[str, List[Any]]:
+    """Build a jsonb expression holding only the requested spreadsheet keys, by column name"""
+    data_sql, params = _compact_data_projection(keys, dataset)
+    if keys is not None and not keys:
+        return data_sql, params
+    return f"pipeline.jsonb_rename_keys({data_sql}, {_column_names_sql(dataset)})", params
+
+def _processed_data_projection(fields: Optional[List[str]], dataset: Dataset = CALIDAD_DATASET) -> Tuple[str, List[Any]]:
+    """
+    Build the stored processed_data for a sparse fieldset (all keys when fields
+    is empty). The result stays compact; _expanded_processed_data rebuilds it
+    """
+    if not fields:
+        return "processed_data", []
+    data_sql, params = _compact_data_projection([f for f in fields if f not in PROCESSED_META_KEYS], dataset)
+    return f"jsonb_build_object('row_index', processed_data->'row_index', 'data', {data_sql})", params
+
+def _generation_join(dataset: Dataset, alias: str) -> str:
+    """Join to the per-load metadata of the generation a row belongs to"""
+    return (
+        f" LEFT JOIN pipeline.data_generations {alias}_generation"
+        f" ON {alias}_generation.data_type = '{dataset.data_type}'"
+        f" AND {alias}_generation.generation = {alias}.created_at"
+    )
+
+def _expanded_processed_data(dataset: Dataset, alias: str, fields: Optional[List[str]] = None) -> str:
+    """
+    processed_data in the response shape, rebuilt from a compact row of a
+    subquery joined with _generation_join: column names from the dictionary,
+    record_id from the row id and processed_at from the generation
+    """
+    meta_sql = {
+        "record_id": f"{alias}.id",
+        "row_index": f"{alias}.processed_data->'row_index'",
+        "processed_at": f"to_jsonb(COALESCE({alias}_generation.processed_at, {alias}.created_at))",
+    }
+    pairs = [f"'{key}', {meta_sql[key]}" for key in PROCESSED_META_KEYS if not fields or key in fields]
+    pairs.append(f"'data', pipeline.jsonb_rename_keys({alias}.processed_data->'data', {_column_names_sql(dataset)})")
+    return "jsonb_build_object(" + ", ".join(pairs) + ")"
+
+# Columns of a calidad producto terminado row, in response order
+CALIDAD_ROW_COLUMNS = "id, source_file, created_at, updated_at"
+
+def _dataset_where(
+    dataset: Dataset,
+    filters: Optional[Dict[str, Any]] = None,
+    match: Optional[Dict[str, Any]] = None,
+    where: Optional[List[FilterCondition]] = None,
+    empresa: Optional[str] = None,
+    as_of: Optional[datetime] = None
+) -> Tuple[str, List[Any]]:
+    """
+    FROM/WHERE part shared by page, count and estimate queries. With as_of
+    (a recorded generation) the rows are rebuilt from the generation history
+    """
+    params: List[Any] = []
+    if as_of is not None:
+        if not dataset.data_type:
+            raise ValueError(f"Generations are not recorded for dataset {dataset.name}")
+        query = f" FROM pipeline.pipeline_data_as_of('{dataset.data_type}', %s) pipeline_data WHERE TRUE"
+        params.append(as_of)
+    else:
+        query = f" FROM {dataset.table} WHERE TRUE"
+    if dataset.data_type:
+        # Inlined from the registry so the planner can use the partial indexes
+        query += f" AND data_type = '{dataset.data_type}'"
+    filter_sql, filter_params = _filter_clause(filters, match, where, dataset)
+    query += filter_sql
+    params += filter_params
+
+    if empresa:
+        query += f" AND processed_data->'data'->>'{dataset.storage_key('EMPRESA')}' ILIKE %s"
+        params.append(f"%{empresa}%")
+    return query, params
+
+def _dataset_select(dataset: Dataset, fields: Optional[List[str]]) -> Tuple[str, List[Any]]:
+    """Select list of a dataset row, with processed_data projected to the requested fields"""
+    if fields and not dataset.projectable:
+        raise ValueError(f"Field projection is not supported for dataset {dataset.name}")
+    projection_sql, projection_params = _processed_data_projection(fields, dataset)
+    columns = [
+        f"{projection_sql} AS processed_data" if column == "processed_data" else column
+        for column in dataset.columns
+    ]
+    return ", ".join(columns), projection_params
+
+def _calidad_page_query(
+    select_sql: str,
+    select_params: List[Any],
+    filters: Optional[Dict[str, Any]] = None,
+    match: Optional[Dict[str, Any]] = None,
+    where: Optional[List[FilterCondition]] = None,
+    empresa: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    dataset: Dataset = CALIDAD_DATASET,
+    as_of: Optional[datetime] = None
+) -> Tuple[str, List[Any]]:
+    """Build a filtered, ordered and paginated query over a dataset (calidad by default)"""
+    where_sql, where_params = _dataset_where(dataset, filters, match, where, empresa, as_of)
+    query = f"SELECT {select_sql} {where_sql}"
+    params = list(select_params) + where_params
+
+    # id breaks ties: every row of a load shares the same created_at
+    query += f" ORDER BY {dataset.order_sql()}"
+
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    query += " OFFSET %s"
+    params.append(offset)
+    return query, params
+
+def _json_row(dataset: Dataset, alias: str, fields: Optional[List[str]] = None) -> str:
+    """json_build_object over the dataset columns of a subquery row"""
+    values = [
+        _expanded_processed_data(dataset, alias, fields) if column == "processed_data" and dataset.compact
+        else f"{alias}.{column}"
+        for column in dataset.columns
+    ]
+    return "json_build_object(" + ", ".join(f"'{column}', {value}" for column, value in zip(dataset.columns, values)) + ")"
+
+def _page_source(page_query: str, dataset: Dataset, alias: str) -> str:
+    """FROM clause over a page subquery, with the generation metadata of compact rows"""
+    source = f"({page_query}) {alias}"
+    return source + _generation_join(dataset, alias) if dataset.compact else source
+
+def _json_page_query(page_query: str, dataset: Dataset = CALIDAD_DATASET, fields: Optional[List[str]] = None) -> str:
+    """Wrap a page query so Postgres returns the whole page as one JSON array"""
+    return f"""
+        SELECT COALESCE(json_agg({_json_row(dataset, "page", fields)} ORDER BY {dataset.order_sql("page")}), '[]')::text
+        FROM {_page_source(page_query, dataset, "page")}
+    """
+
+def _envelope_page_query(page_query: str, dataset: Dataset = CALIDAD_DATASET, fields: Optional[List[str]] = None) -> str:
+    """
+    Wrap a page query fetched with one extra row: returns the JSON page
+    without the extra row, the fetched row count and the window total
+    """
+    numbered_query = f"""
+            SELECT p.*, row_number() OVER (ORDER BY {dataset.order_sql("p")}) AS ordinal
+            FROM ({page_query}) p
+        """
+    return f"""
+        SELECT
+            COALESCE(json_agg({_json_row(dataset, "page", fields)} ORDER BY page.ordinal)
+                FILTER (WHERE %s::bigint IS NULL OR page.ordinal <= %s), '[]')::text,
+            COUNT(*),
+            MAX(page.total_count)
+        FROM {_page_source(numbered_query, dataset, "page")}
+    """
+
+@timed_methods(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
 class DataService:
     """Service for data operations"""
     
@@ -18,41 +295,31 @@ class DataService:
         db,
         limit: Optional[int] = None,
         offset: int = 0,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        fields: Optional[List[str]] = None,
+        empresa: Optional[str] = None
     ) -> List[CalidadProductoTerminado]:
         """Get calidad producto terminado data with filtering"""
         try:
-            query = """
-                SELECT 
-                    id,
-                    source_file,
-                    created_at,
-                    updated_at,
-                    processed_data
-                FROM pipeline.pipeline_data
-                WHERE data_type = 'calidad_producto_terminado'
+            # Project only the requested keys inside Postgres
+            projection_sql, projection_params = _processed_data_projection(fields)
+            page_query, params = _calidad_page_query(
+                f"{CALIDAD_ROW_COLUMNS}, {projection_sql} AS processed_data", projection_params,
+                filters=filters, match=match, where=where, empresa=empresa,
+                limit=limit, offset=offset
+            )
+            # Rebuild the response shape of processed_data for the page rows only
+            query = f"""
+                SELECT page.id, page.source_file, page.created_at, page.updated_at,
+                       {_expanded_processed_data(CALIDAD_DATASET, "page", fields)}
+                FROM {_page_source(page_query, CALIDAD_DATASET, "page")}
+                ORDER BY {CALIDAD_DATASET.order_sql("page")}
             """
             
-            params = []
-            
-            # Add filters if provided
-            if filters:
-                for key, value in filters.items():
-                    if value is not None:
-                        query += f" AND processed_data->'data'->>'{key}' ILIKE %s"
-                        params.append(f"%{value}%")
-            
-            query += " ORDER BY created_at DESC"
-            
-            if limit:
-                query += f" LIMIT %s"
-                params.append(limit)
-            
-            query += f" OFFSET %s"
-            params.append(offset)
-            
             cursor = db.cursor()
-            cursor.execute(query, tuple(params))
+            execute_statement(cursor, query, tuple(params))
             rows = cursor.fetchall()
             
             results = []
@@ -77,49 +344,433 @@ class DataService:
         db,
         empresa: str,
         limit: Optional[int] = None,
-        offset: int = 0
+        offset: int = 0,
+        fields: Optional[List[str]] = None
     ) -> List[CalidadProductoTerminado]:
         """Get calidad producto terminado data filtered by empresa"""
         try:
-            query = """
-                SELECT 
-                    id,
-                    source_file,
-                    created_at,
-                    updated_at,
-                    processed_data
-                FROM pipeline.pipeline_data
-                WHERE data_type = 'calidad_producto_terminado'
-                AND processed_data->'data'->>'EMPRESA' ILIKE %s
-                ORDER BY created_at DESC
-            """
+            return self.get_calidad_producto_terminado(
+                db, limit=limit, offset=offset, fields=fields, empresa=empresa
+            )
+        except Exception as e:
+            logger.error(f"Error getting calidad producto terminado data by empresa: {str(e)}")
+            raise
+
+    def get_calidad_producto_terminado_json(
+        self,
+        db,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        fields: Optional[List[str]] = None,
+        empresa: Optional[str] = None
+    ) -> bytes:
+        """Get a calidad producto terminado page as JSON bytes serialized by Postgres"""
+        try:
+            return self.get_dataset_json(
+                db, CALIDAD_DATASET, limit=limit, offset=offset,
+                filters=filters, match=match, where=where, fields=fields, empresa=empresa
+            )
+        except Exception as e:
+            logger.error(f"Error getting calidad producto terminado JSON: {str(e)}")
+            raise
+
+    def get_calidad_producto_terminado_page_json(
+        self,
+        db,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        fields: Optional[List[str]] = None,
+        empresa: Optional[str] = None,
+        count: str = "exact"
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """Get a calidad producto terminado page as JSON bytes plus pagination metadata"""
+        try:
+            return self.get_dataset_page_json(
+                db, CALIDAD_DATASET, limit=limit, offset=offset,
+                filters=filters, match=match, where=where, fields=fields, empresa=empresa, count=count
+            )
+        except Exception as e:
+            logger.error(f"Error getting calidad producto terminado page: {str(e)}")
+            raise
+
+    def get_dataset_json(
+        self,
+        db,
+        dataset: Dataset,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        fields: Optional[List[str]] = None,
+        empresa: Optional[str] = None,
+        as_of: Optional[datetime] = None
+    ) -> bytes:
+        """Get a page of any registered dataset as JSON bytes serialized by Postgres"""
+        try:
+            select_sql, select_params = _dataset_select(dataset, fields)
+            page_query, params = _calidad_page_query(
+                select_sql, select_params,
+                filters=filters, match=match, where=where, empresa=empresa,
+                limit=limit, offset=offset, dataset=dataset, as_of=as_of
+            )
             
-            params = [f"%{empresa}%"]
+            # The page comes back as text, so there is no per-row parsing in Python
+            cursor = db.cursor()
+            execute_statement(cursor, _json_page_query(page_query, dataset, fields), tuple(params))
+            payload = cursor.fetchone()[0]
+            cursor.close()
+            return payload.encode("utf-8")
             
-            if limit:
-                query += f" LIMIT %s"
-                params.append(limit)
+        except Exception as e:
+            logger.error(f"Error getting {dataset.name} JSON: {str(e)}")
+            raise
+
+    def get_dataset_page_json(
+        self,
+        db,
+        dataset: Dataset,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        fields: Optional[List[str]] = None,
+        empresa: Optional[str] = None,
+        count: str = "exact",
+        as_of: Optional[datetime] = None
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Get a dataset page as JSON bytes plus pagination metadata.
+        count: 'exact' (window function in the same query),
+        'estimated' (planner row estimate) or 'none'
+        """
+        try:
+            offset = offset or 0
+            select_sql, select_params = _dataset_select(dataset, fields)
+            select_sql += ", COUNT(*) OVER () AS total_count" if count == "exact" else ", NULL::bigint AS total_count"
             
-            query += f" OFFSET %s"
-            params.append(offset)
+            # One extra row tells whether another page exists
+            page_query, params = _calidad_page_query(
+                select_sql, select_params,
+                filters=filters, match=match, where=where, empresa=empresa,
+                limit=limit + 1 if limit else None, offset=offset, dataset=dataset, as_of=as_of
+            )
             
             cursor = db.cursor()
-            cursor.execute(query, tuple(params))
-            rows = cursor.fetchall()
+            execute_statement(cursor, _envelope_page_query(page_query, dataset, fields), (limit, limit, *params))
+            payload, fetched, total = cursor.fetchone()
             
-            results = []
-            for row in rows:
-                results.append(CalidadProductoTerminado(
-                    id=row[0],
-                    source_file=row[1],
-                    created_at=row[2],
-                    updated_at=row[3],
-                    processed_data=row[4]
-                ))
+            has_more = bool(limit) and fetched > limit
+            returned = min(fetched, limit) if limit else fetched
+            total_is_estimate = False
             
+            if not has_more and (returned or not offset):
+                # Last page: the total follows from the offset
+                total = offset + returned
+            elif count == "exact" and total is None:
+                # Offset past the end: the window saw no rows
+                where_sql, where_params = _dataset_where(dataset, filters, match, where, empresa, as_of)
+                execute_statement(cursor, f"SELECT COUNT(*) {where_sql}", tuple(where_params))
+                total = cursor.fetchone()[0]
+            elif count == "estimated":
+                where_sql, where_params = _dataset_where(dataset, filters, match, where, empresa, as_of)
+                execute_statement(cursor, f"EXPLAIN (FORMAT JSON) SELECT 1 {where_sql}", tuple(where_params))
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = orjson.loads(plan)
+                # Never report fewer rows than the client has already paged past
+                total = max(int(plan[0]["Plan"]["Plan Rows"]), offset + returned + int(has_more))
+                total_is_estimate = True
             cursor.close()
-            return results
+            
+            meta = {
+                "total": int(total) if total is not None else None,
+                "total_is_estimate": total_is_estimate,
+                "has_more": has_more,
+                "returned": returned,
+            }
+            return payload.encode("utf-8"), meta
             
         except Exception as e:
-            logger.error(f"Error getting calidad producto terminado data by empresa: {str(e)}")
+            logger.error(f"Error getting {dataset.name} page: {str(e)}")
+            raise
+
+    def get_calidad_producto_terminado_table(
+        self,
+        db,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        where: Optional[List[FilterCondition]] = None,
+        empresa: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> pa.Table:
+        """Get calidad producto terminado data as a flat, typed Arrow table"""
+        try:
+            # Project only the requested spreadsheet keys inside Postgres
+            data_columns = [c for c in columns if c not in CALIDAD_META_COLUMNS] if columns else None
+            data_expr, data_params = _data_projection(data_columns)
+
+            query, params = _calidad_page_query(
+                f"id, created_at, (processed_data->>'row_index')::int, ({data_expr})::text", data_params,
+                filters=filters, match=match, where=where, empresa=empresa,
+                limit=limit, offset=offset
+            )
+
+            cursor = db.cursor()
+            if data_columns:
+                # Unknown names would otherwise export as all-null columns
+                execute_statement(cursor, """
+                    SELECT column_name FROM pipeline.data_columns
+                    WHERE data_type = %s AND column_name = ANY(%s::text[])
+                """, (CALIDAD_DATASET.data_type, data_columns))
+                known = {row[0] for row in cursor.fetchall()}
+                for column in data_columns:
+                    if column not in known:
+                        cursor.close()
+                        raise ValueError(f"Export column not allowed: {column}")
+            execute_statement(cursor, query, tuple(params))
+            rows = cursor.fetchall()
+            cursor.close()
+
+            records = []
+            for row in rows:
+                record = {"id": row[0], "created_at": row[1], "row_index": row[2]}
+                record.update(orjson.loads(row[3]) if row[3] else {})
+                records.append(record)
+
+            return build_calidad_table(records, columns)
+
+        except Exception as e:
+            logger.error(f"Error getting calidad producto terminado table: {str(e)}")
+            raise
+
+    def get_calidad_producto_terminado_aggregates(
+        self,
+        db,
+        group_by: Optional[List[str]] = None,
+        date_bucket: Optional[str] = None,
+        metrics: Optional[List[str]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get calidad producto terminado counts and metric summaries from the materialized views"""
+        try:
+            group_by = group_by or []
+            for dimension in [*group_by, *(filters or {})]:
+                if dimension not in AGGREGATION_DIMENSIONS:
+                    raise ValueError(f"Aggregation dimension not allowed: {dimension}")
+            if date_bucket and date_bucket not in AGGREGATION_DATE_BUCKETS:
+                raise ValueError(f"Date bucket not allowed: {date_bucket}")
+            select_columns = [AGGREGATION_DIMENSIONS[dimension] for dimension in group_by]
+            select_params: List[Any] = []
+            if date_bucket:
+                select_columns.append("date_trunc(%s, fecha)::date")
+                select_params.append(date_bucket)
+
+            where = " WHERE TRUE"
+            where_params: List[Any] = []
+            for dimension, value in (filters or {}).items():
+                where += f" AND {AGGREGATION_DIMENSIONS[dimension]} = %s"
+                where_params.append(value)
+            if date_from:
+                where += " AND fecha >= %s"
+                where_params.append(date_from)
+            if date_to:
+                where += " AND fecha <= %s"
+                where_params.append(date_to)
+
+            group_count = len(select_columns)
+            group_sql = ""
+            if group_count:
+                ordinals = ", ".join(str(i) for i in range(1, group_count + 1))
+                group_sql = f" GROUP BY {ordinals} ORDER BY {ordinals}"
+
+            cursor = db.cursor()
+
+            # Record counts per group
+            query = (
+                "SELECT " + ", ".join(select_columns + ["SUM(registros)::bigint"])
+                + " FROM pipeline.mv_calidad_resumen" + where + group_sql
+            )
+            execute_statement(cursor, query, tuple(select_params + where_params))
+
+            results: Dict[Tuple, Dict[str, Any]] = {}
+            for row in cursor.fetchall():
+                key = tuple(row[:group_count])
+                results[key] = self._aggregate_row(group_by, date_bucket, key, row[group_count] or 0)
+
+            # Metric summaries per group; averages are rebuilt from sums and counts
+            if metrics:
+                metric_columns = select_columns + ["metrica"]
+                metric_group = ", ".join(str(i) for i in range(1, len(metric_columns) + 1))
+                query = (
+                    "SELECT " + ", ".join(metric_columns + ["SUM(suma)", "SUM(n)", "MIN(minimo)", "MAX(maximo)"])
+                    + " FROM pipeline.mv_calidad_metricas" + where + " AND metrica = ANY(%s)"
+                    + f" GROUP BY {metric_group}"
+                )
+                execute_statement(cursor, query, tuple(select_params + where_params + [list(metrics)]))
+                for row in cursor.fetchall():
+                    key = tuple(row[:group_count])
+                    metric, total, count, minimum, maximum = row[group_count:]
+                    result = results.setdefault(key, self._aggregate_row(group_by, date_bucket, key, 0))
+                    result["metrics"][metric] = {
+                        "avg": float(total) / float(count) if count else None,
+                        "sum": float(total) if total is not None else None,
+                        "min": float(minimum) if minimum is not None else None,
+                        "max": float(maximum) if maximum is not None else None,
+                    }
+
+            cursor.close()
+            return list(results.values())
+
+        except Exception as e:
+            logger.error(f"Error getting calidad producto terminado aggregates: {str(e)}")
             raise
+
+    def get_data_statistics(self, db, data_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the per-data_type statistics written by the loader with each load"""
+        try:
+            query = """
+                SELECT id, data_type, record_count, file_count, earliest_record, latest_record,
+                       null_rates, load_duration_seconds, generation, calculated_at
+                FROM pipeline.data_statistics
+            """
+            params: List[Any] = []
+            if data_type:
+                query += " WHERE data_type = %s"
+                params.append(data_type)
+            query += " ORDER BY data_type"
+
+            cursor = db.cursor()
+            execute_statement(cursor, query, tuple(params))
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return [
+                {
+                    "id": row[0],
+                    "data_type": row[1],
+                    "record_count": row[2],
+                    "file_count": row[3],
+                    "earliest_record": row[4].isoformat() if row[4] else None,
+                    "latest_record": row[5].isoformat() if row[5] else None,
+                    "null_rates": row[6],
+                    "load_duration_seconds": float(row[7]) if row[7] is not None else None,
+                    "generation": row[8].isoformat() if row[8] else None,
+                    "calculated_at": row[9].isoformat() if row[9] else None,
+                }
+                for row in rows
+            ]
+
+        except Exception as e:
+            logger.error(f"Error getting data statistics: {str(e)}")
+            raise
+
+    def resolve_generation(self, db, data_type: str, as_of: datetime) -> Optional[Tuple[datetime, bool]]:
+        """
+        Latest retained generation at or before as_of and whether it is the
+        current one; None when as_of predates the retention window
+        """
+        try:
+            cursor = db.cursor()
+            execute_statement(cursor, """
+                SELECT g.generation,
+                       g.generation = (SELECT MAX(generation) FROM pipeline.data_generations WHERE data_type = %s)
+                FROM pipeline.data_generations g
+                WHERE g.data_type = %s AND g.generation <= %s
+                ORDER BY g.generation DESC
+                LIMIT 1
+            """, (data_type, data_type, as_of))
+            row = cursor.fetchone()
+            cursor.close()
+            return (row[0], row[1]) if row else None
+
+        except Exception as e:
+            logger.error(f"Error resolving generation of {data_type}: {str(e)}")
+            raise
+
+    def get_generations(self, db, data_type: str) -> List[Dict[str, Any]]:
+        """Retained generations of a data_type with their change counts, newest first"""
+        try:
+            cursor = db.cursor()
+            execute_statement(cursor, """
+                SELECT generation, record_count, inserted_rows, updated_rows, deleted_rows
+                FROM pipeline.data_generations
+                WHERE data_type = %s
+                ORDER BY generation DESC
+            """, (data_type,))
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return [
+                {
+                    "generation": row[0].isoformat(),
+                    "record_count": row[1],
+                    "inserted_rows": row[2],
+                    "updated_rows": row[3],
+                    "deleted_rows": row[4],
+                }
+                for row in rows
+            ]
+
+        except Exception as e:
+            logger.error(f"Error getting generations of {data_type}: {str(e)}")
+            raise
+
+    def get_generation_changes_json(
+        self,
+        db,
+        dataset: Dataset,
+        generation: datetime,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> bytes:
+        """Rows inserted, updated or deleted by one generation as JSON bytes serialized by Postgres"""
+        data_type = dataset.data_type
+        try:
+            # Deleted rows carry no data; compact rows are rebuilt to the response shape
+            processed_sql = _expanded_processed_data(dataset, "c") if dataset.compact else "c.processed_data"
+            query = f"""
+                SELECT COALESCE(json_agg(json_build_object(
+                    'operation', c.operation, 'row_index', c.row_index, 'id', c.id,
+                    'source_file', c.source_file,
+                    'processed_data', CASE WHEN c.processed_data IS NOT NULL THEN {processed_sql} END
+                ) ORDER BY c.row_index, c.id), '[]')::text
+                FROM (
+                    SELECT operation, row_index, id, source_file, processed_data, generation AS created_at
+                    FROM pipeline.data_generation_changes
+                    WHERE data_type = %s AND generation = %s
+                    ORDER BY row_index, id
+                    LIMIT %s OFFSET %s
+                ) c{_generation_join(dataset, "c") if dataset.compact else ""}
+            """
+            cursor = db.cursor()
+            execute_statement(cursor, query, (data_type, generation, limit, offset or 0))
+            payload = cursor.fetchone()[0]
+            cursor.close()
+            return payload.encode("utf-8")
+
+        except Exception as e:
+            logger.error(f"Error getting changes of {data_type} generation {generation}: {str(e)}")
+            raise
+
+    @staticmethod
+    def _aggregate_row(group_by: List[str], date_bucket: Optional[str], key: Tuple, registros: int) -> Dict[str, Any]:
+        """Build one aggregation result row from its group key"""
+        row: Dict[str, Any] = dict(zip(group_by, key))
+        if date_bucket:
+            fecha = key[len(group_by)]
+            row["fecha"] = fecha.isoformat() if fecha else None
+        row["registros"] = int(registros)
+        row["metrics"] = {}
+        return row
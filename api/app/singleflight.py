@@ -0,0 +1,47 @@
+"""
+Request coalescing: concurrent identical queries share one database call
+"""
+
+import asyncio
+from typing import Any, Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Run a blocking call once per key while it is in flight; later callers await the same result"""
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Return fn(*args, **kwargs), run in the threadpool and shared by concurrent callers"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting caller does not cancel the query for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, float]:
+        """Execution and coalescing counters"""
+        calls = self.executions + self.coalesced
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+            "coalesced_ratio": round(self.coalesced / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,69 @@
+"""
+Statement execution for the query shapes built by DataService: every statement
+is counted per shape and passed to the statement hooks with its duration
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+def shape_name(query: str) -> str:
+    """Stable name of a query shape (the SQL text, parameters excluded)"""
+    return "q_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+
+
+class QueryShapeRegistry:
+    """Query shapes seen by the API and how often each ran"""
+
+    def __init__(self):
+        self.statements = 0
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, query: str) -> str:
+        """Count one execution of a query shape; every parameter value maps to the same name"""
+        name = shape_name(query)
+        with self._lock:
+            self.statements += 1
+            shape = self._shapes.get(name)
+            if shape is None:
+                self._shapes[name] = {"executions": 1, "query": " ".join(query.split())[:200]}
+            else:
+                shape["executions"] += 1
+        return name
+
+    def stats(self) -> Dict[str, Any]:
+        """Shape and statement counts"""
+        with self._lock:
+            return {"shapes": len(self._shapes), "statements": self.statements}
+
+    def top_shapes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most executed query shapes"""
+        with self._lock:
+            top = sorted(self._shapes.items(), key=lambda item: item[1]["executions"], reverse=True)[:limit]
+            return [{"name": name, **shape} for name, shape in top]
+
+
+query_shapes = QueryShapeRegistry()
+
+# Called as hook(query, params, seconds) after every statement run through
+# execute_statement, e.g. the slow-query log (api/app/querylog.py)
+statement_hooks: List[Callable[[str, tuple, float], None]] = []
+
+
+def execute_statement(cursor, query: str, params: Optional[Sequence[Any]] = None) -> None:
+    """Execute a query, recording its shape and timing it for the statement hooks"""
+    params = tuple(params or ())
+    query_shapes.record(query)
+    if not statement_hooks:
+        cursor.execute(query, params)
+        return
+    started = time.perf_counter()
+    try:
+        cursor.execute(query, params)
+    finally:
+        elapsed = time.perf_counter() - started
+        for hook in statement_hooks:
+            hook(query, params, elapsed)
@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for the API: several uvicorn worker processes
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Graceful reload (new code or settings, no dropped requests): send SIGHUP to
+the master, e.g. `docker kill -s HUP pipeline-api`. New workers start, then
+the old ones finish their in-flight requests (up to graceful_timeout) and run
+the shutdown hooks (audit queue flush, pool close) before exiting.
+"""
+
+import os
+
+# Blocking psycopg2 calls run in each worker's threadpool; one worker per core
+# (capped: every worker holds its own connection pool and caches)
+workers = int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 8)))
+
+# Inherited by the workers: app.config reads it to split the connection budget
+# (db_pool_budget) and the admission limits among them
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Exports can take a while; a worker silent for longer is restarted
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Each worker imports the app itself (pool, background tasks, LISTEN connection)
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
@@ -45,4 +45,30 @@ CREATE TABLE IF NOT EXISTS pipeline.data_statistics (
   calculated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Diccionario de columnas de processed_data: cada nombre de columna de la planilla
+-- se guarda en disco con una clave corta estable por data_type (posición en texto).
+-- Las claves de los filtros de calidad están fijas porque los índices de expresión
+-- (03/04) y las vistas (02) las usan; el loader agrega las columnas nuevas al final.
+-- Debe coincidir con CALIDAD_STORAGE_KEYS en api/app/datasets.py.
+CREATE TABLE IF NOT EXISTS pipeline.data_columns (
+  data_type VARCHAR(100) NOT NULL,
+  column_name TEXT NOT NULL,
+  short_key TEXT NOT NULL,
+  PRIMARY KEY (data_type, column_name),
+  UNIQUE (data_type, short_key)
+);
 
+INSERT INTO pipeline.data_columns (data_type, column_name, short_key) VALUES
+  ('calidad_producto_terminado', 'EMPRESA', '0'),
+  ('calidad_producto_terminado', 'PRODUCTOR', '1'),
+  ('calidad_producto_terminado', 'VARIEDAD', '2'),
+  ('calidad_producto_terminado', 'DESTINO', '3'),
+  ('calidad_producto_terminado', 'PRESENTACION', '4'),
+  ('calidad_producto_terminado', 'TIPO DE CAJA', '5'),
+  ('calidad_producto_terminado', 'N° FCL', '6'),
+  ('calidad_producto_terminado', 'TRAZABILIDAD', '7'),
+  ('calidad_producto_terminado', 'TURNO', '8'),
+  ('calidad_producto_terminado', 'MODULO', '9'),
+  ('calidad_producto_terminado', 'FECHA DE MP', '10'),
+  ('calidad_producto_terminado', 'FECHA DE PROCESO', '11')
+ON CONFLICT DO NOTHING;
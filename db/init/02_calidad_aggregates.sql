@@ -0,0 +1,60 @@
+-- Agregados de calidad producto terminado para dashboards.
+-- Las vistas materializadas se refrescan desde el loader (jobs/etl/extraer.py)
+-- dentro de la misma transacción que reemplaza los datos.
+-- processed_data->'data' usa las claves cortas de pipeline.data_columns (01_init.sql).
+
+-- Fecha ISO ('YYYY-MM-DD...') a DATE; NULL si el valor no tiene formato de fecha
+CREATE OR REPLACE FUNCTION pipeline.iso_date(value TEXT) RETURNS DATE
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT CASE WHEN value ~ '^\d{4}-\d{2}-\d{2}' THEN substr(value, 1, 10)::date END
+$$;
+
+-- Conteo de registros por dimensiones y fecha de proceso
+CREATE MATERIALIZED VIEW IF NOT EXISTS pipeline.mv_calidad_resumen AS
+SELECT
+  COALESCE(d->>'0', 'NO ESPECIFICADO') AS empresa,  -- EMPRESA
+  COALESCE(d->>'1', 'NO ESPECIFICADO') AS productor,  -- PRODUCTOR
+  COALESCE(d->>'2', 'NO ESPECIFICADO') AS variedad,  -- VARIEDAD
+  COALESCE(d->>'3', 'NO ESPECIFICADO') AS destino,  -- DESTINO
+  COALESCE(d->>'4', 'NO ESPECIFICADO') AS presentacion,  -- PRESENTACION
+  COALESCE(d->>'8', '-') AS turno,  -- TURNO
+  pipeline.iso_date(d->>'11') AS fecha,  -- FECHA DE PROCESO
+  COUNT(*) AS registros
+FROM (
+  SELECT processed_data->'data' AS d
+  FROM pipeline.pipeline_data
+  WHERE data_type = 'calidad_producto_terminado'
+) calidad
+GROUP BY 1, 2, 3, 4, 5, 6, 7;
+
+CREATE INDEX IF NOT EXISTS idx_mv_calidad_resumen_fecha ON pipeline.mv_calidad_resumen (fecha);
+CREATE INDEX IF NOT EXISTS idx_mv_calidad_resumen_empresa ON pipeline.mv_calidad_resumen (empresa, fecha);
+
+-- Suma, conteo, mínimo y máximo de cada columna numérica por dimensiones y fecha
+-- (los promedios se recomponen como SUM(suma) / SUM(n) al agrupar)
+CREATE MATERIALIZED VIEW IF NOT EXISTS pipeline.mv_calidad_metricas AS
+SELECT
+  COALESCE(d->>'0', 'NO ESPECIFICADO') AS empresa,  -- EMPRESA
+  COALESCE(d->>'1', 'NO ESPECIFICADO') AS productor,  -- PRODUCTOR
+  COALESCE(d->>'2', 'NO ESPECIFICADO') AS variedad,  -- VARIEDAD
+  COALESCE(d->>'3', 'NO ESPECIFICADO') AS destino,  -- DESTINO
+  COALESCE(d->>'4', 'NO ESPECIFICADO') AS presentacion,  -- PRESENTACION
+  COALESCE(d->>'8', '-') AS turno,  -- TURNO
+  pipeline.iso_date(d->>'11') AS fecha,  -- FECHA DE PROCESO
+  c.column_name AS metrica,
+  SUM(m.value::numeric) AS suma,
+  COUNT(*) AS n,
+  MIN(m.value::numeric) AS minimo,
+  MAX(m.value::numeric) AS maximo
+FROM (
+  SELECT processed_data->'data' AS d
+  FROM pipeline.pipeline_data
+  WHERE data_type = 'calidad_producto_terminado'
+) calidad
+CROSS JOIN LATERAL jsonb_each(d) m
+JOIN pipeline.data_columns c ON c.data_type = 'calidad_producto_terminado' AND c.short_key = m.key
+WHERE jsonb_typeof(m.value) = 'number'
+GROUP BY 1, 2, 3, 4, 5, 6, 7, 8;
+
+CREATE INDEX IF NOT EXISTS idx_mv_calidad_metricas_metrica ON pipeline.mv_calidad_metricas (metrica, fecha);
+CREATE INDEX IF NOT EXISTS idx_mv_calidad_metricas_empresa ON pipeline.mv_calidad_metricas (empresa, metrica);
@@ -0,0 +1,46 @@
+-- Índices para los filtros de calidad producto terminado
+-- (TEXT_FILTER_KEYS / MATCH_FILTER_KEYS en api/app/services.py).
+-- Son parciales sobre data_type = 'calidad_producto_terminado', que todas las consultas incluyen.
+-- Las claves son las cortas de pipeline.data_columns (01_init.sql).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Coincidencia exacta: processed_data->'data' @> '{"0": "..."}' (EMPRESA)
+CREATE INDEX IF NOT EXISTS idx_calidad_data_gin
+  ON pipeline.pipeline_data USING gin ((processed_data->'data') jsonb_path_ops)
+  WHERE data_type = 'calidad_producto_terminado';
+
+-- Búsqueda parcial: processed_data->'data'->>'<clave>' ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_empresa
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'0') gin_trgm_ops)  -- EMPRESA
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_productor
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'1') gin_trgm_ops)  -- PRODUCTOR
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_variedad
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'2') gin_trgm_ops)  -- VARIEDAD
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_destino
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'3') gin_trgm_ops)  -- DESTINO
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_presentacion
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'4') gin_trgm_ops)  -- PRESENTACION
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_tipo_caja
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'5') gin_trgm_ops)  -- TIPO DE CAJA
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_fcl
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'6') gin_trgm_ops)  -- N° FCL
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_trgm_trazabilidad
+  ON pipeline.pipeline_data USING gin ((processed_data->'data'->>'7') gin_trgm_ops)  -- TRAZABILIDAD
+  WHERE data_type = 'calidad_producto_terminado';
+
+ANALYZE pipeline.pipeline_data;
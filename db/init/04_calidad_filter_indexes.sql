@@ -0,0 +1,40 @@
+-- Índices de expresión para el DSL de filtros tipados
+-- (TYPED_FILTER_FIELDS en api/app/services.py). Las expresiones deben
+-- coincidir exactamente con las que compila DataService; las claves son las
+-- cortas de pipeline.data_columns (01_init.sql).
+
+-- Número JSON a NUMERIC; NULL si el valor no es numérico
+CREATE OR REPLACE FUNCTION pipeline.jsonb_numeric(value JSONB) RETURNS NUMERIC
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT CASE WHEN jsonb_typeof(value) = 'number' THEN value::numeric END
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_calidad_fecha_proceso
+  ON pipeline.pipeline_data (pipeline.iso_date(processed_data->'data'->>'11'))  -- FECHA DE PROCESO
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_fecha_mp
+  ON pipeline.pipeline_data (pipeline.iso_date(processed_data->'data'->>'10'))  -- FECHA DE MP
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_turno
+  ON pipeline.pipeline_data (pipeline.jsonb_numeric(processed_data->'data'->'8'))  -- TURNO
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_modulo
+  ON pipeline.pipeline_data (pipeline.jsonb_numeric(processed_data->'data'->'9'))  -- MODULO
+  WHERE data_type = 'calidad_producto_terminado';
+
+-- Igualdad, IN y prefijo sobre columnas de texto (complementa los índices trigram)
+CREATE INDEX IF NOT EXISTS idx_calidad_productor
+  ON pipeline.pipeline_data ((processed_data->'data'->>'1') text_pattern_ops)  -- PRODUCTOR
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_fcl
+  ON pipeline.pipeline_data ((processed_data->'data'->>'6') text_pattern_ops)  -- N° FCL
+  WHERE data_type = 'calidad_producto_terminado';
+
+CREATE INDEX IF NOT EXISTS idx_calidad_created_at
+  ON pipeline.pipeline_data (data_type, created_at DESC);
+
+ANALYZE pipeline.pipeline_data;
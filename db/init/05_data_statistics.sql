@@ -0,0 +1,8 @@
+-- Estadísticas por data_type escritas por el loader (jobs/etl/extraer.py)
+-- en la misma transacción que reemplaza los datos. La API las lee sin
+-- recorrer pipeline_data. El id es el propio data_type.
+
+ALTER TABLE pipeline.data_statistics
+  ADD COLUMN IF NOT EXISTS null_rates JSONB,
+  ADD COLUMN IF NOT EXISTS load_duration_seconds NUMERIC,
+  ADD COLUMN IF NOT EXISTS generation TIMESTAMPTZ;
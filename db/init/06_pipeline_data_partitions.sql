@@ -0,0 +1,90 @@
+-- pipeline.pipeline_data particionada por LIST (data_type).
+-- Todas las consultas filtran por data_type con un literal, así Postgres poda
+-- las particiones de los demás tipos; y cada carga del loader (jobs/etl/extraer.py)
+-- reemplaza una partición completa (DETACH/ATTACH) en lugar de borrar filas.
+-- No se subparticiona por fecha: cada carga reemplaza el data_type entero.
+
+-- Partición de un data_type, creada si no existe. Devuelve su nombre.
+-- Las filas que hubieran caído en la partición por defecto se mueven a la nueva.
+CREATE OR REPLACE FUNCTION pipeline.asegurar_particion(p_data_type TEXT) RETURNS TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+  particion TEXT := left('pipeline_data_' || regexp_replace(lower(p_data_type), '[^a-z0-9_]+', '_', 'g'), 55);
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'pipeline.pipeline_data'::regclass AND c.relname = particion
+  ) THEN
+    RETURN particion;
+  END IF;
+
+  EXECUTE format('CREATE TABLE pipeline.%I (LIKE pipeline.pipeline_data INCLUDING DEFAULTS)', particion);
+  EXECUTE format('ALTER TABLE pipeline.%I ADD CONSTRAINT %I CHECK (data_type = %L)',
+                 particion, particion || '_tipo', p_data_type);
+  EXECUTE format(
+    'WITH movidas AS (DELETE FROM pipeline.pipeline_data_default WHERE data_type = %L RETURNING *)
+     INSERT INTO pipeline.%I SELECT * FROM movidas',
+    p_data_type, particion);
+  EXECUTE format('ALTER TABLE pipeline.pipeline_data ATTACH PARTITION pipeline.%I FOR VALUES IN (%L)',
+                 particion, p_data_type);
+  RETURN particion;
+END
+$$;
+
+-- Migración de la tabla heap de 01_init.sql (instalación nueva o existente)
+SELECT relkind = 'r' AS pipeline_data_heap
+FROM pg_class
+WHERE oid = 'pipeline.pipeline_data'::regclass \gset
+
+\if :pipeline_data_heap
+BEGIN;
+
+-- Las vistas materializadas dependen de la tabla; se recrean abajo
+DROP MATERIALIZED VIEW IF EXISTS pipeline.mv_calidad_metricas;
+DROP MATERIALIZED VIEW IF EXISTS pipeline.mv_calidad_resumen;
+
+ALTER TABLE pipeline.pipeline_data RENAME TO pipeline_data_heap;
+ALTER TABLE pipeline.pipeline_data_heap RENAME CONSTRAINT pipeline_data_pkey TO pipeline_data_heap_pkey;
+
+-- La clave de partición debe formar parte de la clave primaria
+CREATE TABLE pipeline.pipeline_data (
+  id VARCHAR(255) NOT NULL,
+  source_file VARCHAR(500),
+  data_type VARCHAR(100) NOT NULL,
+  raw_data JSONB,
+  processed_data JSONB,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  partition_date DATE DEFAULT CURRENT_DATE,
+  PRIMARY KEY (data_type, id)
+) PARTITION BY LIST (data_type);
+
+-- Filas de un data_type sin partición propia (inserciones fuera del loader)
+CREATE TABLE pipeline.pipeline_data_default PARTITION OF pipeline.pipeline_data DEFAULT;
+
+SELECT pipeline.asegurar_particion(data_type)
+FROM (SELECT DISTINCT data_type FROM pipeline.pipeline_data_heap WHERE data_type IS NOT NULL) tipos;
+
+INSERT INTO pipeline.pipeline_data (id, source_file, data_type, raw_data, processed_data, created_at, updated_at, partition_date)
+SELECT id, source_file, COALESCE(data_type, 'sin_tipo'), raw_data, processed_data, created_at, updated_at, created_at::date
+FROM pipeline.pipeline_data_heap;
+
+DROP TABLE pipeline.pipeline_data_heap;
+
+-- Vistas e índices sobre la tabla particionada (se propagan a cada partición);
+-- 01_init.sql aporta el diccionario de columnas que usan las vistas
+\ir 01_init.sql
+\ir 02_calidad_aggregates.sql
+\ir 03_calidad_indexes.sql
+\ir 04_calidad_filter_indexes.sql
+
+COMMIT;
+\endif
+
+-- Orden por defecto de la API (created_at DESC, id): dentro de una partición
+-- data_type es constante, así una página sale del índice sin ordenar la carga entera
+CREATE INDEX IF NOT EXISTS idx_pipeline_data_orden
+  ON pipeline.pipeline_data (created_at DESC, id);
+
+ANALYZE pipeline.pipeline_data;
@@ -0,0 +1,73 @@
+-- Historial de generaciones: cada carga del loader (jobs/etl/extraer.py) guarda
+-- sólo las filas que cambiaron respecto de la generación anterior, con el id
+-- como clave: el loader lo deriva del contenido de la fila, así que es estable
+-- entre cargas y no depende de su posición en la planilla. El estado de cualquier generación retenida se reconstruye con
+-- pipeline.pipeline_data_as_of; el loader pliega las generaciones que salen de
+-- la ventana de retención en la más antigua que se conserva.
+
+-- Una fila por carga
+CREATE TABLE IF NOT EXISTS pipeline.data_generations (
+  data_type VARCHAR(100) NOT NULL,
+  generation TIMESTAMPTZ NOT NULL,
+  record_count INT,
+  inserted_rows INT,
+  updated_rows INT,
+  deleted_rows INT,
+  PRIMARY KEY (data_type, generation)
+);
+
+-- Historial anterior con row_index como clave: los ids se regeneraban en cada
+-- carga, así que no se puede re-clavar. Se descarta y la próxima carga guarda
+-- la generación vigente completa como base.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.key_column_usage
+    WHERE table_schema = 'pipeline' AND table_name = 'data_generation_changes'
+      AND constraint_name = 'data_generation_changes_pkey' AND column_name = 'row_index'
+  ) THEN
+    DROP TABLE pipeline.data_generation_changes;
+    DELETE FROM pipeline.data_generations;
+  END IF;
+END $$;
+
+-- Deltas por fila: I (nueva), U (modificada) o D (eliminada, sin datos).
+-- row_index es la posición de la fila en la planilla de esa generación, no
+-- forma parte de la clave: insertar una fila no marca las siguientes.
+CREATE TABLE IF NOT EXISTS pipeline.data_generation_changes (
+  data_type VARCHAR(100) NOT NULL,
+  id VARCHAR(255) NOT NULL,
+  generation TIMESTAMPTZ NOT NULL,
+  operation CHAR(1) NOT NULL CHECK (operation IN ('I', 'U', 'D')),
+  row_index INT,
+  source_file VARCHAR(500),
+  processed_data JSONB,
+  PRIMARY KEY (data_type, id, generation)
+);
+
+-- Cambios de una generación (endpoint de cambios y retención)
+CREATE INDEX IF NOT EXISTS idx_data_generation_changes_generation
+  ON pipeline.data_generation_changes (data_type, generation);
+
+-- Filas vigentes de un data_type en una generación: el último delta de cada
+-- id hasta esa generación, salvo los borrados. Mismas columnas que
+-- consulta la API sobre pipeline_data; created_at/updated_at son la generación.
+CREATE OR REPLACE FUNCTION pipeline.pipeline_data_as_of(p_data_type TEXT, p_generation TIMESTAMPTZ)
+RETURNS TABLE (
+  id VARCHAR(255),
+  source_file VARCHAR(500),
+  data_type VARCHAR(100),
+  processed_data JSONB,
+  created_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ
+)
+LANGUAGE sql STABLE AS $$
+  SELECT c.id, c.source_file, c.data_type, c.processed_data, p_generation, p_generation
+  FROM (
+    SELECT DISTINCT ON (ch.id) ch.*
+    FROM pipeline.data_generation_changes ch
+    WHERE ch.data_type = p_data_type AND ch.generation <= p_generation
+    ORDER BY ch.id, ch.generation DESC
+  ) c
+  WHERE c.operation <> 'D'
+$$;
@@ -0,0 +1,136 @@
+-- Formato compacto de processed_data en pipeline_data y en el historial de generaciones:
+--   {"row_index": n, "data": {"<clave corta>": valor, ...}}
+-- Los nombres de columna viven en pipeline.data_columns (01_init.sql); record_id
+-- repetía el id de la fila y processed_at se guarda una vez por carga en
+-- pipeline.data_generations, junto con las columnas de esa generación.
+-- raw_data vacío queda como NULL de SQL en lugar de JSON null.
+-- La API reconstruye la forma original de processed_data al responder.
+
+-- Diccionario de columnas en instalaciones existentes
+\ir 01_init.sql
+
+ALTER TABLE pipeline.data_generations
+  ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ,
+  ADD COLUMN IF NOT EXISTS columns JSONB;
+
+-- Objeto con las claves renombradas según names ({"clave corta": "nombre"})
+CREATE OR REPLACE FUNCTION pipeline.jsonb_rename_keys(data JSONB, names JSONB) RETURNS JSONB
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT COALESCE(jsonb_object_agg(COALESCE(names->>e.key, e.key), e.value), '{}'::jsonb)
+  FROM jsonb_each(data) e
+$$;
+
+-- Objeto con sólo las claves indicadas
+CREATE OR REPLACE FUNCTION pipeline.jsonb_pick(data JSONB, keys TEXT[]) RETURNS JSONB
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT COALESCE(jsonb_object_agg(e.key, e.value), '{}'::jsonb)
+  FROM jsonb_each(data) e
+  WHERE e.key = ANY(keys)
+$$;
+
+-- Migración: filas en el formato anterior o índices/vistas con nombres completos
+SELECT EXISTS (SELECT 1 FROM pipeline.pipeline_data WHERE processed_data ? 'record_id')
+    OR EXISTS (SELECT 1 FROM pipeline.data_generation_changes WHERE processed_data ? 'record_id')
+    OR EXISTS (
+         SELECT 1 FROM pg_indexes
+         WHERE schemaname = 'pipeline' AND indexname = 'idx_calidad_fecha_proceso'
+           AND indexdef LIKE '%FECHA DE PROCESO%'
+       ) AS compactar \gset
+
+\if :compactar
+BEGIN;
+
+DROP MATERIALIZED VIEW IF EXISTS pipeline.mv_calidad_metricas;
+DROP MATERIALIZED VIEW IF EXISTS pipeline.mv_calidad_resumen;
+
+-- Índices de expresión sobre nombres completos (se recrean con claves cortas)
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_empresa;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_productor;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_variedad;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_destino;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_presentacion;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_tipo_caja;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_fcl;
+DROP INDEX IF EXISTS pipeline.idx_calidad_trgm_trazabilidad;
+DROP INDEX IF EXISTS pipeline.idx_calidad_fecha_proceso;
+DROP INDEX IF EXISTS pipeline.idx_calidad_fecha_mp;
+DROP INDEX IF EXISTS pipeline.idx_calidad_turno;
+DROP INDEX IF EXISTS pipeline.idx_calidad_modulo;
+DROP INDEX IF EXISTS pipeline.idx_calidad_productor;
+DROP INDEX IF EXISTS pipeline.idx_calidad_fcl;
+
+-- Columnas que no están en el diccionario, a continuación de las existentes
+INSERT INTO pipeline.data_columns (data_type, column_name, short_key)
+SELECT
+  nuevas.data_type,
+  nuevas.column_name,
+  (COALESCE(ultima.posicion, -1) + row_number() OVER (PARTITION BY nuevas.data_type ORDER BY nuevas.column_name))::text
+FROM (
+  SELECT DISTINCT p.data_type, k AS column_name
+  FROM pipeline.pipeline_data p, jsonb_object_keys(p.processed_data->'data') k
+  WHERE p.processed_data ? 'record_id'
+  UNION
+  SELECT DISTINCT h.data_type, k
+  FROM pipeline.data_generation_changes h, jsonb_object_keys(h.processed_data->'data') k
+  WHERE h.processed_data ? 'record_id'
+) nuevas
+LEFT JOIN (
+  SELECT data_type, MAX(short_key::int) AS posicion FROM pipeline.data_columns GROUP BY data_type
+) ultima ON ultima.data_type = nuevas.data_type
+WHERE NOT EXISTS (
+  SELECT 1 FROM pipeline.data_columns c
+  WHERE c.data_type = nuevas.data_type AND c.column_name = nuevas.column_name
+);
+
+-- processed_at y columnas, una vez por generación
+UPDATE pipeline.data_generations g
+SET processed_at = s.processed_at
+FROM (
+  SELECT data_type, created_at AS generation, MIN((processed_data->>'processed_at')::timestamptz) AS processed_at
+  FROM pipeline.pipeline_data
+  WHERE processed_data ? 'processed_at'
+  GROUP BY 1, 2
+  UNION ALL
+  SELECT data_type, generation, MIN((processed_data->>'processed_at')::timestamptz)
+  FROM pipeline.data_generation_changes
+  WHERE processed_data ? 'processed_at'
+  GROUP BY 1, 2
+) s
+WHERE g.data_type = s.data_type AND g.generation = s.generation AND g.processed_at IS NULL;
+
+UPDATE pipeline.data_generations g
+SET columns = (SELECT jsonb_agg(c.column_name ORDER BY c.short_key::int) FROM pipeline.data_columns c WHERE c.data_type = g.data_type)
+WHERE g.columns IS NULL;
+
+-- Reescritura de las filas al formato compacto. La próxima carga del loader
+-- reemplaza la partición por una tabla nueva; hasta entonces VACUUM FULL
+-- devuelve el espacio de las versiones anteriores de las filas.
+UPDATE pipeline.pipeline_data p
+SET raw_data = NULLIF(p.raw_data, 'null'::jsonb),
+    processed_data = jsonb_build_object(
+      'row_index', p.processed_data->'row_index',
+      'data', (
+        SELECT COALESCE(jsonb_object_agg(c.short_key, e.value), '{}'::jsonb)
+        FROM jsonb_each(p.processed_data->'data') e
+        JOIN pipeline.data_columns c ON c.data_type = p.data_type AND c.column_name = e.key
+      )
+    )
+WHERE p.processed_data ? 'record_id';
+
+UPDATE pipeline.data_generation_changes h
+SET processed_data = jsonb_build_object(
+      'row_index', h.processed_data->'row_index',
+      'data', (
+        SELECT COALESCE(jsonb_object_agg(c.short_key, e.value), '{}'::jsonb)
+        FROM jsonb_each(h.processed_data->'data') e
+        JOIN pipeline.data_columns c ON c.data_type = h.data_type AND c.column_name = e.key
+      )
+    )
+WHERE h.processed_data ? 'record_id';
+
+\ir 02_calidad_aggregates.sql
+\ir 03_calidad_indexes.sql
+\ir 04_calidad_filter_indexes.sql
+
+COMMIT;
+\endif
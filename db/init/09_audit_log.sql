@@ -0,0 +1,30 @@
+-- Auditoría de consultas a la API: quién consultó qué, con qué filtros,
+-- cuántas filas y cuánto tardó. La API (api/app/audit.py) acumula los eventos
+-- en memoria y los escribe por lotes fuera del camino de la petición.
+-- Las columnas de cambios de datos (old_data/new_data) quedan para auditar
+-- modificaciones; una consulta sólo llena las de petición.
+
+CREATE TABLE IF NOT EXISTS pipeline.audit_log (
+  id VARCHAR(255) PRIMARY KEY,
+  table_name VARCHAR(100) NOT NULL,
+  operation VARCHAR(20) NOT NULL,
+  record_id VARCHAR(255),
+  old_data JSONB,
+  new_data JSONB,
+  changed_at TIMESTAMPTZ DEFAULT NOW(),
+  changed_by VARCHAR(100) DEFAULT 'system'
+);
+
+ALTER TABLE pipeline.audit_log
+  ADD COLUMN IF NOT EXISTS endpoint VARCHAR(500),
+  ADD COLUMN IF NOT EXISTS status_code SMALLINT,
+  ADD COLUMN IF NOT EXISTS filters JSONB,
+  ADD COLUMN IF NOT EXISTS row_count INT,
+  ADD COLUMN IF NOT EXISTS latency_ms NUMERIC;
+
+-- Consultas recientes y por usuario
+CREATE INDEX IF NOT EXISTS idx_audit_log_changed_at
+  ON pipeline.audit_log (changed_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_changed_by
+  ON pipeline.audit_log (changed_by, changed_at DESC);
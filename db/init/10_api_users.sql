@@ -0,0 +1,19 @@
+-- Usuarios de la API (api/app/auth.py). hashed_password es bcrypt ya calculado:
+-- la API sólo verifica contraseñas, nunca las hashea al arrancar.
+-- Para agregar un usuario o cambiar una contraseña:
+--   python -c "from passlib.hash import bcrypt; print(bcrypt.hash('...'))"
+
+CREATE TABLE IF NOT EXISTS pipeline.api_users (
+  username VARCHAR(100) PRIMARY KEY,
+  hashed_password VARCHAR(100) NOT NULL,
+  full_name VARCHAR(255),
+  email VARCHAR(255),
+  disabled BOOLEAN NOT NULL DEFAULT FALSE,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Cuentas iniciales (admin/admin123, user/user123); cambiar en producción
+INSERT INTO pipeline.api_users (username, hashed_password, full_name, email) VALUES
+  ('admin', '$2b$12$R11idRtcQqeEhlvtM1q69uAwu2xf3VvlhicLzCIhTVbGoR1yMJjde', 'Administrator', 'admin@example.com'),
+  ('user', '$2b$12$jxi6pbDcnBvBbVksWHWiK.r0FCg89b5QjrpUzOoWDKHFqiwIWGQIq', 'Regular User', 'user@example.com')
+ON CONFLICT (username) DO NOTHING;
@@ -0,0 +1,23 @@
+-- Planes de consultas lentas de la API (api/app/querylog.py): una muestra de
+-- las sentencias sobre el umbral se vuelve a ejecutar con
+-- EXPLAIN (ANALYZE, BUFFERS) y el plan queda aquí, junto a la forma de la
+-- consulta y sus parámetros. Se consulta en GET /api/v1/admin/slow-queries/plans.
+
+CREATE TABLE IF NOT EXISTS pipeline.slow_query_plans (
+  id BIGSERIAL PRIMARY KEY,
+  captured_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  -- Nombre de la forma (hash del SQL, igual que la sentencia preparada)
+  shape VARCHAR(40) NOT NULL,
+  query TEXT NOT NULL,
+  params JSONB,
+  -- Duración de la ejecución lenta y del re-ejecutado con EXPLAIN ANALYZE
+  duration_ms NUMERIC NOT NULL,
+  explain_ms NUMERIC,
+  plan JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_query_plans_captured_at
+  ON pipeline.slow_query_plans (captured_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_slow_query_plans_shape
+  ON pipeline.slow_query_plans (shape, captured_at DESC);
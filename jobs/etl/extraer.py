@@ -5,14 +5,30 @@ import pandas as pd
 import tempfile
 import psycopg2
 import json
-import uuid
+import hashlib
 from datetime import datetime, timedelta, time, date
 from utils.onedrive_extractor import OneDriveExtractor
 from utils.zona_horaria import get_peru_datetime
-from utils.config_loader import get_database_config
+from utils.config_loader import get_database_config, get_etl_config
 
 logger = logging.getLogger(__name__)
 
+# Vistas materializadas de agregados (db/init/02_calidad_aggregates.sql)
+VISTAS_MATERIALIZADAS = ("pipeline.mv_calidad_resumen", "pipeline.mv_calidad_metricas")
+
+# Columna con la fecha de negocio de cada registro (earliest/latest en data_statistics)
+COLUMNA_FECHA_REGISTRO = "FECHA DE PROCESO"
+
+# Canal LISTEN/NOTIFY con el que la API se entera de cada generación nueva
+CANAL_GENERACIONES = "pipeline_generations"
+
+# Días de historial de generaciones (etl.retencion_generaciones_dias en config.yaml)
+RETENCION_GENERACIONES_DIAS = 7
+
+def dias_retencion_generaciones():
+    """Ventana de retención del historial, configurable por entorno."""
+    return int(get_etl_config().get('retencion_generaciones_dias', RETENCION_GENERACIONES_DIAS))
+
 def extract_onedrive_files():
     
     extractor = OneDriveExtractor()
@@ -34,6 +50,19 @@ def extract_onedrive_files():
     download_url = extractor.get_download_url_by_name(files, target_filename)
     return pd.read_excel(download_url, sheet_name="CALIDAD PRODUCTO TERMINADO")
 
+def id_por_contenido(raw_data, ocurrencias):
+    """
+    ID del registro derivado de sus valores: la misma fila recibe el mismo id
+    en cada carga aunque cambie de posición en la planilla. Las filas idénticas
+    se numeran en orden de aparición (ocurrencias se comparte en la carga).
+    """
+    contenido = json.dumps(raw_data, sort_keys=True, default=str)
+    huella = hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:16]
+    ocurrencias[huella] = ocurrencias.get(huella, 0) + 1
+    if ocurrencias[huella] == 1:
+        return f"calidad_{huella}"
+    return f"calidad_{huella}_{ocurrencias[huella]}"
+
 def transform_onedrive_files():
     df = extract_onedrive_files()
     logger.info(f"📊 Datos cargados: {len(df)} filas, {len(df.columns)} columnas")
@@ -89,11 +118,9 @@ def transform_onedrive_files():
         
     logger.info(f"📊 Después de rellenar nulls numéricos: {len(df)} filas")
     processed_records = []
+    ocurrencias = {}
         
     for index, row in df.iterrows():
-            # Generar ID único para cada registro
-            record_id = f"calidad_{uuid.uuid4().hex[:8]}"
-            
             # Convertir fila a diccionario y manejar timestamps y time
             raw_data = {}
             for col, value in row.items():
@@ -106,6 +133,9 @@ def transform_onedrive_files():
                 else:
                     raw_data[col] = value
             
+            # ID estable entre cargas: hash del contenido, no de la posición
+            record_id = id_por_contenido(raw_data, ocurrencias)
+            
             # Crear registro en formato JSON
             record = {
                 'id': record_id,
@@ -131,13 +161,301 @@ def transform_onedrive_files():
     return processed_records
 
 
+def refrescar_vistas_materializadas(cursor):
+    """
+    Refresca las vistas de agregados con los datos ya publicados. Corre en su
+    propia transacción después del intercambio: leen pipeline_data, y dentro de
+    la transacción del intercambio la partición queda bloqueada para la API.
+    """
+    for vista in VISTAS_MATERIALIZADAS:
+        cursor.execute("SELECT to_regclass(%s)", (vista,))
+        if cursor.fetchone()[0] is None:
+            logger.warning(f"⚠️ Vista materializada {vista} no existe, se omite el refresco")
+            continue
+        cursor.execute(f"REFRESH MATERIALIZED VIEW {vista}")
+    logger.info("✅ Vistas materializadas refrescadas")
+
+
+def calcular_tasas_nulos(records):
+    """
+    Fracción de valores nulos por columna de processed_data['data'].
+    """
+    conteo_nulos = {}
+    for record in records:
+        for columna, valor in record['processed_data']['data'].items():
+            conteo_nulos[columna] = conteo_nulos.get(columna, 0) + (valor is None)
+    total = len(records)
+    return {columna: round(nulos / total, 4) for columna, nulos in conteo_nulos.items()} if total else {}
+
+
+def compactar_registros(cursor, data_type, records):
+    """
+    Pasa processed_data al formato compacto de db/init/08_compact_storage.sql:
+    {"row_index": n, "data": {"<clave corta>": valor}}. Las columnas nuevas se
+    agregan a pipeline.data_columns a continuación de las existentes; record_id
+    (igual al id) y processed_at (uno por carga) no se guardan por fila.
+    Devuelve (processed_at de la carga, columnas en orden).
+    """
+    columnas = list(dict.fromkeys(
+        columna for record in records for columna in record['processed_data']['data']
+    ))
+    cursor.execute(
+        "SELECT column_name, short_key FROM pipeline.data_columns WHERE data_type = %s",
+        (data_type,)
+    )
+    claves = dict(cursor.fetchall())
+    siguiente = max((int(clave) for clave in claves.values()), default=-1) + 1
+    nuevas = [columna for columna in columnas if columna not in claves]
+    for posicion, columna in enumerate(nuevas, start=siguiente):
+        claves[columna] = str(posicion)
+        cursor.execute("""
+            INSERT INTO pipeline.data_columns (data_type, column_name, short_key)
+            VALUES (%s, %s, %s)
+        """, (data_type, columna, claves[columna]))
+    if nuevas:
+        logger.info(f"🔑 {len(nuevas)} columnas nuevas en el diccionario de {data_type}")
+
+    procesado_en = min((record['processed_data']['processed_at'] for record in records), default=None)
+    for record in records:
+        processed = record['processed_data']
+        record['processed_data'] = {
+            'row_index': processed['row_index'],
+            'data': {claves[columna]: valor for columna, valor in processed['data'].items()}
+        }
+    return procesado_en, columnas
+
+
+def guardar_estadisticas(cursor, data_type, tabla_carga, tasas_nulos, duracion_segundos, generacion):
+    """
+    Escribe las estadísticas del data_type dentro de la transacción del
+    reemplazo, así los endpoints de estadísticas no recorren pipeline_data.
+    Se calculan sobre la tabla de carga, que pasa a ser la vigente al commit.
+    """
+    cursor.execute(f"""
+        INSERT INTO pipeline.data_statistics (
+            id, data_type, record_count, file_count, earliest_record, latest_record,
+            null_rates, load_duration_seconds, generation, calculated_at
+        )
+        SELECT
+            %s, %s, COUNT(*), COUNT(DISTINCT source_file),
+            MIN(pipeline.iso_date(processed_data->'data'->>fecha.short_key)),
+            MAX(pipeline.iso_date(processed_data->'data'->>fecha.short_key)),
+            %s::jsonb, %s, %s, NOW()
+        FROM {tabla_carga} carga,
+             -- Clave corta de la columna de fecha (db/init/08_compact_storage.sql)
+             (SELECT MAX(short_key) AS short_key FROM pipeline.data_columns
+              WHERE data_type = %s AND column_name = %s) fecha
+        WHERE carga.data_type = %s
+        ON CONFLICT (id) DO UPDATE SET
+            data_type = EXCLUDED.data_type,
+            record_count = EXCLUDED.record_count,
+            file_count = EXCLUDED.file_count,
+            earliest_record = EXCLUDED.earliest_record,
+            latest_record = EXCLUDED.latest_record,
+            null_rates = EXCLUDED.null_rates,
+            load_duration_seconds = EXCLUDED.load_duration_seconds,
+            generation = EXCLUDED.generation,
+            calculated_at = EXCLUDED.calculated_at
+    """, (
+        data_type, data_type, json.dumps(tasas_nulos), round(duracion_segundos, 3), generacion,
+        data_type, COLUMNA_FECHA_REGISTRO, data_type
+    ))
+    logger.info(f"✅ Estadísticas de {data_type} actualizadas")
+
+
+def registrar_generacion(cursor, data_type, tabla_carga, generacion, procesado_en=None, columnas=None):
+    """
+    Guarda la carga como generación: sólo las filas nuevas (I), modificadas (U)
+    o eliminadas (D) respecto de la generación vigente, usando el id como clave,
+    junto con el processed_at y las columnas de la carga. Con ids por contenido
+    (id_por_contenido) una fila editada queda como D + I, y una fila que sólo
+    cambia de posición no genera delta.
+    Devuelve (filas nuevas o modificadas, filas eliminadas).
+    """
+    # Primera generación registrada: la vigente se guarda completa como base
+    cursor.execute("SELECT 1 FROM pipeline.data_generations WHERE data_type = %s LIMIT 1", (data_type,))
+    if cursor.fetchone() is None:
+        cursor.execute("""
+            WITH base AS (
+                INSERT INTO pipeline.data_generation_changes
+                    (data_type, id, generation, operation, row_index, source_file, processed_data)
+                SELECT data_type, id, MAX(created_at) OVER (), 'I',
+                       (processed_data->>'row_index')::int, source_file, processed_data
+                FROM pipeline.pipeline_data
+                WHERE data_type = %s
+                RETURNING generation
+            )
+            INSERT INTO pipeline.data_generations (data_type, generation, record_count, inserted_rows, updated_rows, deleted_rows)
+            SELECT %s, MAX(generation), COUNT(*), COUNT(*), 0, 0 FROM base
+            HAVING COUNT(*) > 0
+        """, (data_type, data_type))
+
+    cursor.execute(f"""
+        WITH anterior AS (
+            SELECT id, (processed_data->>'row_index')::int AS fila, source_file, processed_data->'data' AS datos
+            FROM pipeline.pipeline_data
+            WHERE data_type = %(data_type)s
+        ), nueva AS (
+            SELECT id, (processed_data->>'row_index')::int AS fila, source_file, processed_data
+            FROM {tabla_carga}
+            WHERE data_type = %(data_type)s
+        ), deltas AS (
+            INSERT INTO pipeline.data_generation_changes
+                (data_type, id, generation, operation, row_index, source_file, processed_data)
+            SELECT %(data_type)s, n.id, %(generacion)s, CASE WHEN a.id IS NULL THEN 'I' ELSE 'U' END,
+                   n.fila, n.source_file, n.processed_data
+            FROM nueva n
+            LEFT JOIN anterior a ON a.id = n.id
+            WHERE a.id IS NULL OR a.datos IS DISTINCT FROM n.processed_data->'data'
+            UNION ALL
+            SELECT %(data_type)s, a.id, %(generacion)s, 'D', a.fila, a.source_file, NULL
+            FROM anterior a
+            WHERE NOT EXISTS (SELECT 1 FROM nueva n WHERE n.id = a.id)
+            RETURNING operation
+        )
+        INSERT INTO pipeline.data_generations (
+            data_type, generation, record_count, inserted_rows, updated_rows, deleted_rows, processed_at, columns
+        )
+        SELECT
+            %(data_type)s, %(generacion)s, (SELECT COUNT(*) FROM nueva),
+            COUNT(*) FILTER (WHERE operation = 'I'),
+            COUNT(*) FILTER (WHERE operation = 'U'),
+            COUNT(*) FILTER (WHERE operation = 'D'),
+            %(procesado_en)s, %(columnas)s::jsonb
+        FROM deltas
+        RETURNING inserted_rows, updated_rows, deleted_rows
+    """, {
+        'data_type': data_type,
+        'generacion': generacion,
+        'procesado_en': procesado_en,
+        'columnas': json.dumps(columnas) if columnas is not None else None
+    })
+    insertadas, actualizadas, eliminadas = cursor.fetchone()
+    logger.info(f"🗂️ Generación {generacion.isoformat()}: {insertadas} nuevas, {actualizadas} modificadas, {eliminadas} eliminadas")
+    return insertadas + actualizadas, eliminadas
+
+
+def aplicar_retencion(cursor, data_type, generacion, dias_retencion):
+    """
+    Pliega las generaciones más antiguas que la ventana de retención en la
+    generación base (la más reciente fuera de la ventana): de cada id se
+    conserva sólo su último delta hasta la base, y se descartan los borrados.
+    El estado de la base y de las generaciones posteriores no cambia.
+    """
+    cursor.execute("""
+        SELECT MAX(generation) FROM pipeline.data_generations
+        WHERE data_type = %s AND generation <= %s
+    """, (data_type, generacion - timedelta(days=dias_retencion)))
+    base = cursor.fetchone()[0]
+    if base is None:
+        return
+    cursor.execute("""
+        DELETE FROM pipeline.data_generation_changes h
+        WHERE h.data_type = %s AND h.generation < %s
+          AND EXISTS (
+              SELECT 1 FROM pipeline.data_generation_changes n
+              WHERE n.data_type = h.data_type AND n.id = h.id
+                AND n.generation > h.generation AND n.generation <= %s
+          )
+    """, (data_type, base, base))
+    plegadas = cursor.rowcount
+    cursor.execute("""
+        DELETE FROM pipeline.data_generation_changes
+        WHERE data_type = %s AND generation <= %s AND operation = 'D'
+    """, (data_type, base))
+    plegadas += cursor.rowcount
+    cursor.execute("""
+        DELETE FROM pipeline.data_generations WHERE data_type = %s AND generation < %s
+    """, (data_type, base))
+    logger.info(f"🧹 Retención de {dias_retencion} días: {cursor.rowcount} generaciones y {plegadas} deltas plegados en {base.isoformat()}")
+
+
+def es_particionada(cursor):
+    """
+    True si pipeline.pipeline_data ya es la tabla particionada de
+    db/init/06_pipeline_data_partitions.sql.
+    """
+    cursor.execute("""
+        SELECT relkind = 'p' FROM pg_class WHERE oid = 'pipeline.pipeline_data'::regclass
+    """)
+    return cursor.fetchone()[0]
+
+
+def crear_tabla_carga(cursor, data_type, peru_now):
+    """
+    Crea la tabla donde se escribe la carga nueva. Con la tabla particionada es
+    una copia de la partición del data_type (mismos índices y CHECK de data_type,
+    así el ATTACH no revalida filas); si no, la tabla temporal de siempre.
+    Devuelve (tabla_carga, partición o None).
+    """
+    if not es_particionada(cursor):
+        logger.warning("⚠️ pipeline.pipeline_data no está particionada, se reemplaza con DELETE/INSERT")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline.pipeline_data_temp (
+                id VARCHAR(255) PRIMARY KEY,
+                source_file VARCHAR(500),
+                data_type VARCHAR(100),
+                raw_data JSONB,
+                processed_data JSONB,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT %s,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT %s
+            )
+        """, (peru_now, peru_now))
+        cursor.execute("DELETE FROM pipeline.pipeline_data_temp")
+        return "pipeline.pipeline_data_temp", None
+
+    cursor.execute("SELECT pipeline.asegurar_particion(%s)", (data_type,))
+    particion = cursor.fetchone()[0]
+    tabla_carga = f"pipeline.{particion}_carga"
+    cursor.execute(f"DROP TABLE IF EXISTS {tabla_carga}")
+    cursor.execute(f"""
+        CREATE TABLE {tabla_carga}
+            (LIKE pipeline.pipeline_data INCLUDING DEFAULTS INCLUDING INDEXES)
+    """)
+    cursor.execute(f"ALTER TABLE {tabla_carga} ADD CHECK (data_type = %s)", (data_type,))
+    return tabla_carga, particion
+
+
+def reemplazar_datos(cursor, data_type, tabla_carga, particion):
+    """
+    Reemplaza la generación vigente del data_type por la tabla de carga:
+    intercambio de particiones (DETACH/ATTACH) o, sin particiones, DELETE + INSERT.
+    El DETACH bloquea toda pipeline_data (ACCESS EXCLUSIVE) hasta el commit, así
+    que debe ser lo último de la transacción.
+    """
+    if particion is None:
+        cursor.execute("DELETE FROM pipeline.pipeline_data WHERE data_type = %s", (data_type,))
+        cursor.execute(f"""
+            INSERT INTO pipeline.pipeline_data (id, source_file, data_type, raw_data, processed_data, created_at, updated_at)
+            SELECT id, source_file, data_type, raw_data, processed_data, created_at, updated_at
+            FROM {tabla_carga}
+        """)
+        cursor.execute(f"DROP TABLE IF EXISTS {tabla_carga}")
+        return
+
+    cursor.execute(f"ALTER TABLE pipeline.pipeline_data DETACH PARTITION pipeline.{particion}")
+    cursor.execute(
+        f"ALTER TABLE pipeline.pipeline_data ATTACH PARTITION {tabla_carga} FOR VALUES IN (%s)",
+        (data_type,)
+    )
+    cursor.execute(f"DROP TABLE pipeline.{particion}")
+    cursor.execute(f"ALTER TABLE {tabla_carga} RENAME TO {particion}")
+    logger.info(f"✅ Partición pipeline.{particion} reemplazada")
+
+
+def anunciar_generacion(cursor, evento):
+    """
+    NOTIFY con la generación nueva; Postgres lo entrega al hacer commit,
+    así la API nunca se entera de una carga revertida.
+    """
+    cursor.execute("SELECT pg_notify(%s, %s)", (CANAL_GENERACIONES, json.dumps(evento)))
+    logger.info(f"📣 Generación anunciada: {evento}")
+
+
 def load_onedrive_records_to_postgres():
 
-    processed_info = transform_onedrive_files()
-    records = processed_info
-    total_records = len(processed_info)
-    del processed_info
-    logger.info(f"📥 Cargando {total_records} registros a PostgreSQL (reemplazando datos existentes)...")
+    inicio_carga = get_peru_datetime()
+    records = transform_onedrive_files()
         
         # Obtener configuración de base de datos
     db_config = get_database_config()
@@ -148,82 +466,83 @@ def load_onedrive_records_to_postgres():
             user=db_config.get('user', 'pipeline_user'),
             password=db_config.get('password', 'pipeline_pass')
         )
+    try:
+        return cargar_registros(conn, records, inicio_carga)
+    finally:
+        conn.close()
+
+
+def cargar_registros(conn, records, inicio_carga, dias_retencion=None):
+    """
+    Reemplaza los datos de calidad por records (formato de transform_onedrive_files)
+    como una nueva generación. También lo usa benchmarks/loadtest.py para
+    sembrar filas sintéticas con el mismo formato que la carga real.
+    """
+    if dias_retencion is None:
+        dias_retencion = dias_retencion_generaciones()
+    total_records = len(records)
+    logger.info(f"📥 Cargando {total_records} registros a PostgreSQL (reemplazando datos existentes)...")
         
     cursor = conn.cursor()
     try:
-            # Paso 1: Crear tabla temporal
-            logger.info("🔄 Creando tabla temporal...")
+            # Paso 1: Crear tabla de carga
+            logger.info("🔄 Creando tabla de carga...")
             # Obtener timestamp actual en zona horaria de Perú
             peru_now = get_peru_datetime()
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS pipeline.pipeline_data_temp (
-                    id VARCHAR(255) PRIMARY KEY,
-                    source_file VARCHAR(500),
-                    data_type VARCHAR(100),
-                    raw_data JSONB,
-                    processed_data JSONB,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT %s,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT %s
-                )
-            """, (peru_now, peru_now))
-            
-            # Paso 2: Limpiar tabla temporal
-            cursor.execute("DELETE FROM pipeline.pipeline_data_temp")
-            
-            # Paso 3: Insertar nuevos datos en tabla temporal
-            logger.info("📝 Insertando datos en tabla temporal...")
+            tabla_carga, particion = crear_tabla_carga(cursor, 'calidad_producto_terminado', peru_now)
+            
+            # Tasas de nulos con los nombres de columna, antes de compactar
+            tasas_nulos = calcular_tasas_nulos(records)
+            procesado_en, columnas = compactar_registros(cursor, 'calidad_producto_terminado', records)
+            
+            # Paso 2: Insertar nuevos datos en la tabla de carga
+            logger.info(f"📝 Insertando datos en {tabla_carga}...")
             for record in records:
-                cursor.execute("""
-                    INSERT INTO pipeline.pipeline_data_temp (id, source_file, data_type, raw_data, processed_data, created_at, updated_at)
+                cursor.execute(f"""
+                    INSERT INTO {tabla_carga} (id, source_file, data_type, raw_data, processed_data, created_at, updated_at)
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """, (
                     record['id'],
                     record['source_file'],
                     record['data_type'],
-                    json.dumps(record['raw_data']),
+                    json.dumps(record['raw_data']) if record['raw_data'] is not None else None,
                     json.dumps(record['processed_data']),
                     peru_now,
                     peru_now
                 ))
             
-            # Paso 4: Verificar que los datos se insertaron correctamente
-            cursor.execute("SELECT COUNT(*) FROM pipeline.pipeline_data_temp")
+            # Paso 3: Verificar que los datos se insertaron correctamente
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla_carga}")
             temp_count = cursor.fetchone()[0]
             
             if temp_count != total_records:
                 raise Exception(f"Error: Se insertaron {temp_count} registros en temp, pero se esperaban {total_records}")
             
-            logger.info(f"✅ {temp_count} registros insertados en tabla temporal")
+            logger.info(f"✅ {temp_count} registros insertados en tabla de carga")
             
-            # Paso 5: Reemplazar tabla principal de forma atómica
-            logger.info("🔄 Reemplazando tabla principal...")
+            # Paso 4: Estadísticas del planificador antes de publicar la partición
+            cursor.execute(f"ANALYZE {tabla_carga}")
             
             # Obtener conteo de registros existentes para comparación
             cursor.execute("SELECT COUNT(*) FROM pipeline.pipeline_data WHERE data_type = 'calidad_producto_terminado'")
             old_count = cursor.fetchone()[0]
+            new_count = temp_count
             
-            # Eliminar registros existentes del tipo específico
-            cursor.execute("DELETE FROM pipeline.pipeline_data WHERE data_type = 'calidad_producto_terminado'")
-            
-            # Insertar nuevos datos desde la tabla temporal
-            cursor.execute("""
-                INSERT INTO pipeline.pipeline_data (id, source_file, data_type, raw_data, processed_data, created_at, updated_at)
-                SELECT id, source_file, data_type, raw_data, processed_data, created_at, updated_at
-                FROM pipeline.pipeline_data_temp
-            """)
-            
-            # Verificar que la inserción fue exitosa
-            cursor.execute("SELECT COUNT(*) FROM pipeline.pipeline_data WHERE data_type = 'calidad_producto_terminado'")
-            new_count = cursor.fetchone()[0]
-            
-            if new_count != total_records:
-                raise Exception(f"Error: Se insertaron {new_count} registros en principal, pero se esperaban {total_records}")
+            # Deltas respecto de la generación vigente (antes de reemplazarla)
+            filas_cambiadas, filas_eliminadas = registrar_generacion(
+                cursor, 'calidad_producto_terminado', tabla_carga, peru_now, procesado_en, columnas
+            )
+            aplicar_retencion(cursor, 'calidad_producto_terminado', peru_now, dias_retencion)
             
-            # Paso 6: Limpiar tabla temporal
-            cursor.execute("DROP TABLE IF EXISTS pipeline.pipeline_data_temp")
+            # Paso 5: Estadísticas del data_type con los datos nuevos (de la tabla de carga)
+            duracion = (get_peru_datetime() - inicio_carga).total_seconds()
+            guardar_estadisticas(cursor, 'calidad_producto_terminado', tabla_carga, tasas_nulos, duracion, peru_now)
             
-            # Commit de todos los cambios
+            # Paso 6: Reemplazar tabla principal de forma atómica. Va al final: desde
+            # el DETACH hasta el commit la API no puede leer pipeline_data
+            logger.info("🔄 Reemplazando tabla principal...")
+            reemplazar_datos(cursor, 'calidad_producto_terminado', tabla_carga, particion)
             conn.commit()
             
             logger.info(f"✅ Reemplazo completado exitosamente:")
@@ -235,10 +554,35 @@ def load_onedrive_records_to_postgres():
             # Rollback en caso de error
         conn.rollback()
         logger.error(f"❌ Error durante el reemplazo: {e}")
+        cursor.close()
         raise
+
+    try:
+        # Paso 7: Refrescar agregados con los datos ya publicados
+        logger.info("🔄 Refrescando vistas materializadas...")
+        error_vistas = None
+        try:
+            refrescar_vistas_materializadas(cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            error_vistas = e
+            logger.error(f"❌ Error refrescando vistas materializadas: {e}")
         
+        # Paso 8: Anunciar la nueva generación después del refresco, para que la
+        # API no vuelva a cachear agregados viejos; los datos ya cambiaron, así
+        # que se anuncia aunque el refresco haya fallado
+        anunciar_generacion(cursor, {
+            'data_type': 'calidad_producto_terminado',
+            'generation': peru_now.isoformat(),
+            'record_count': new_count,
+            'previous_count': old_count,
+            'changed_rows': filas_cambiadas,
+            'removed_rows': filas_eliminadas
+        })
+        conn.commit()
+        if error_vistas is not None:
+            raise error_vistas
     finally:
         cursor.close()
-        conn.close()
     return f"Datos reemplazados exitosamente: {total_records} registros (reemplazó {old_count} anteriores)"
-        
\ No newline at end of file
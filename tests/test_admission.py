@@ -0,0 +1,135 @@
+"""
+Admission control (api/app/admission.py): token buckets, 429 vs 503, and the
+heavy-query queue. Pure in-process logic; no database needed.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import admission
+from app.admission import AdmissionController, AdmissionRejected, HeavySlots, TokenBucket
+
+
+class Clock:
+    """Stands in for time.monotonic inside app.admission"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+
+def controller(user_rate=1, user_burst=2, global_rate=1, global_burst=3):
+    limits = {"query": {
+        "user_rate": user_rate, "user_burst": user_burst,
+        "global_rate": global_rate, "global_burst": global_burst,
+    }}
+    return AdmissionController(limits, HeavySlots(1, 1, 0.05))
+
+
+def test_token_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=2, burst=4)
+    now = clock.now
+    assert bucket.take(now, cost=4) == 0
+    assert bucket.take(now) == 0.5
+    assert bucket.take(now + 1) == 0
+    assert bucket.available(now + 100) == 4
+    # A charge above the burst is clamped, so it can eventually be admitted
+    assert bucket.take(now + 100, cost=10) == 0
+
+
+def test_caller_over_its_limit_gets_429(clock):
+    control = controller()
+    control.check_rate("query", "ana")
+    control.check_rate("query", "ana")
+    with pytest.raises(AdmissionRejected) as rejected:
+        control.check_rate("query", "ana")
+    assert rejected.value.status_code == 429
+    assert control.rejected_user["query"] == 1
+    # Other callers have their own bucket
+    control.check_rate("query", "luis")
+
+
+def test_empty_global_bucket_gets_503_and_gives_back(clock):
+    control = controller(user_burst=5, global_burst=3)
+    control.check_rate("query", "ana", cost=3)
+    with pytest.raises(AdmissionRejected) as rejected:
+        control.check_rate("query", "luis", cost=2)
+    assert rejected.value.status_code == 503
+    assert control.rejected_global["query"] == 1
+    # The caller was within its own limit: its tokens are returned
+    assert control.usage("luis")["query"]["remaining"] == 5
+    assert control.admitted["query"] == 3
+
+
+@pytest.mark.parametrize("wait, retry_after", [(0.0, 1), (0.2, 1), (1.0, 1), (1.01, 2), (2.5, 3)])
+def test_retry_after_rounds_up_to_whole_seconds(wait, retry_after):
+    assert AdmissionRejected(429, wait, "").retry_after == retry_after
+
+
+def test_retry_after_reflects_refill_time(clock):
+    control = controller(user_rate=0.25, user_burst=1)
+    control.check_rate("query", "ana")
+    clock.now += 1
+    with pytest.raises(AdmissionRejected) as rejected:
+        control.check_rate("query", "ana")
+    # 0.75 tokens missing at 0.25/s: 3 s
+    assert rejected.value.retry_after == 3
+
+
+def test_idle_user_buckets_are_evicted(clock, monkeypatch):
+    monkeypatch.setattr(admission, "_MAX_TRACKED_USERS", 3)
+    control = controller(user_burst=2, global_burst=10)
+    control.check_rate("query", "a")
+    control.check_rate("query", "b")
+    control.check_rate("query", "c")
+    clock.now += 0.5
+    control.check_rate("query", "a")
+    clock.now += 1.0
+    # b and c are full again, a is not: only the idle buckets are dropped
+    control.check_rate("query", "d")
+    assert set(user for _, user in control._users) == {"a", "d"}
+
+
+def test_heavy_queue_full_is_rejected():
+    async def scenario():
+        slots = HeavySlots(limit=1, queue_size=1, deadline_seconds=1)
+        await slots.acquire()
+        waiter = asyncio.ensure_future(slots.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await slots.acquire()
+        assert rejected.value.status_code == 503
+        slots.release()
+        await waiter
+        assert slots.status()["active"] == 1 and slots.status()["queued"] == 1
+        slots.release()
+
+    asyncio.run(scenario())
+
+
+def test_heavy_queue_deadline_is_rejected():
+    async def scenario():
+        slots = HeavySlots(limit=1, queue_size=5, deadline_seconds=0.05)
+        await slots.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await slots.acquire()
+        assert rejected.value.status_code == 503
+        assert slots.timed_out == 1 and slots.waiting == 0
+        slots.release()
+        # The slot is usable again after the timed-out waiter left
+        await slots.acquire()
+        assert slots.active == 1
+
+    asyncio.run(scenario())
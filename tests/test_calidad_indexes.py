@@ -0,0 +1,71 @@
+"""
+The calidad filter expressions built by DataService must match the indexes of
+db/init/03_calidad_indexes.sql, or Postgres falls back to scanning the table.
+"""
+
+import json
+
+import pytest
+
+from app.services import _filter_clause
+
+CALIDAD_QUERY = "SELECT id FROM pipeline.pipeline_data WHERE data_type = 'calidad_producto_terminado'"
+
+
+def index_names(cursor, index: str) -> set:
+    """The index and its per-partition copies (06_pipeline_data_partitions.sql)"""
+    cursor.execute("""
+        WITH RECURSIVE tree AS (
+            SELECT oid FROM pg_class WHERE relname = %s
+            UNION ALL
+            SELECT i.inhrelid FROM pg_inherits i JOIN tree t ON i.inhparent = t.oid
+        )
+        SELECT c.relname FROM pg_class c JOIN tree t ON c.oid = t.oid
+    """, (index,))
+    names = {row[0] for row in cursor.fetchall()}
+    if not names:
+        pytest.skip(f"index {index} not present")
+    return names
+
+
+def plan_indexes(cursor, filters=None, match=None) -> set:
+    """Index names used by the plan of the calidad query with these filters"""
+    clause, params = _filter_clause(filters, match)
+    # Only whether an index can serve the expression matters, not the row count
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {CALIDAD_QUERY}{clause}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    found = set()
+
+    def walk(node):
+        if "Index Name" in node:
+            found.add(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return found
+
+
+def test_match_uses_jsonb_gin_index(cursor):
+    expected = index_names(cursor, "idx_calidad_data_gin")
+    used = plan_indexes(cursor, match={"EMPRESA": "SAN LUCAR S.A."})
+    assert used & expected, f"plan used {used or 'no index'}"
+
+
+@pytest.mark.parametrize("key, index", [
+    ("EMPRESA", "idx_calidad_trgm_empresa"),
+    ("PRODUCTOR", "idx_calidad_trgm_productor"),
+    ("VARIEDAD", "idx_calidad_trgm_variedad"),
+    ("N° FCL", "idx_calidad_trgm_fcl"),
+])
+def test_substring_filter_uses_trigram_index(cursor, key, index):
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if cursor.fetchone() is None:
+        pytest.skip("pg_trgm not installed")
+    expected = index_names(cursor, index)
+    used = plan_indexes(cursor, filters={key: "BERR"})
+    assert used & expected, f"plan used {used or 'no index'}"
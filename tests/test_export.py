@@ -0,0 +1,22 @@
+"""
+Columnar export of calidad producto terminado (DataService.get_calidad_producto_terminado_table).
+"""
+
+import pytest
+
+from app.services import DataService
+
+
+def test_unknown_export_column_is_rejected(cursor):
+    with pytest.raises(ValueError, match="NOPE"):
+        DataService().get_calidad_producto_terminado_table(
+            cursor.connection, columns=["EMPRESA", "NOPE"], limit=5
+        )
+
+
+def test_export_keeps_requested_columns(cursor):
+    columns = ["id", "created_at", "EMPRESA", "FECHA DE PROCESO", "OBSERVACIONES"]
+    table = DataService().get_calidad_producto_terminado_table(cursor.connection, columns=columns, limit=5)
+    assert table.column_names == columns
+    assert table.num_rows == 5
+    assert table.column("EMPRESA").null_count == 0
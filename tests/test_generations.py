@@ -0,0 +1,124 @@
+"""
+Generation history written by the loader (jobs/etl/extraer.py): I/U/D deltas,
+retention folding and pipeline.pipeline_data_as_of must reconstruct every
+retained generation exactly.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jobs"))
+extraer = pytest.importorskip("etl.extraer")
+
+# Rows of this data_type only exist inside the test transaction
+DATA_TYPE = "test_generaciones"
+
+T0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def cargar(cursor, generacion, filas, dias_retencion=7):
+    """One load as cargar_registros does it: deltas, retention, then publish"""
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS carga (LIKE pipeline.pipeline_data)")
+    cursor.execute("DELETE FROM carga")
+    for row_index, (record_id, data) in enumerate(filas.items()):
+        cursor.execute("""
+            INSERT INTO carga (id, source_file, data_type, processed_data, created_at, updated_at)
+            VALUES (%s, 'test.xlsx', %s, %s, %s, %s)
+        """, (record_id, DATA_TYPE, json.dumps({"row_index": row_index, "data": data}), generacion, generacion))
+    resultado = extraer.registrar_generacion(cursor, DATA_TYPE, "carga", generacion)
+    extraer.aplicar_retencion(cursor, DATA_TYPE, generacion, dias_retencion)
+    cursor.execute("DELETE FROM pipeline.pipeline_data WHERE data_type = %s", (DATA_TYPE,))
+    cursor.execute("INSERT INTO pipeline.pipeline_data SELECT * FROM carga")
+    return resultado
+
+
+def as_of(cursor, generacion):
+    cursor.execute("""
+        SELECT id, processed_data->'data' FROM pipeline.pipeline_data_as_of(%s, %s)
+    """, (DATA_TYPE, generacion))
+    return dict(cursor.fetchall())
+
+
+def generaciones(cursor):
+    cursor.execute("""
+        SELECT generation, inserted_rows, updated_rows, deleted_rows
+        FROM pipeline.data_generations WHERE data_type = %s ORDER BY generation
+    """, (DATA_TYPE,))
+    return cursor.fetchall()
+
+
+def filas(ids, valor=0):
+    return {f"r{i:03d}": {"A": f"valor {i}", "B": i + valor} for i in ids}
+
+
+def test_deltas_reconstruct_each_generation(cursor):
+    primera = filas(range(30))
+    # 10 deleted, 10 updated in place, 10 new rows inserted ahead of the rest:
+    # every surviving row moves, which must not count as an update
+    segunda = {**filas(range(100, 110)), **filas(range(10, 20), valor=1000), **filas(range(20, 30))}
+    g1, g2 = T0, T0 + timedelta(hours=1)
+
+    assert cargar(cursor, g1, primera) == (30, 0)
+    assert cargar(cursor, g2, segunda) == (20, 10)
+
+    assert generaciones(cursor) == [(g1, 30, 0, 0), (g2, 10, 10, 10)]
+    assert as_of(cursor, g1) == primera
+    assert as_of(cursor, g2) == segunda
+    # Between generations the earlier one is read
+    assert as_of(cursor, g2 - timedelta(minutes=1)) == primera
+
+
+def test_unchanged_load_records_no_deltas(cursor):
+    primera = filas(range(5))
+    cargar(cursor, T0, primera)
+    assert cargar(cursor, T0 + timedelta(hours=1), primera) == (0, 0)
+    assert as_of(cursor, T0 + timedelta(hours=1)) == primera
+
+
+def test_retention_folds_insert_then_delete(cursor):
+    base = filas(range(5))
+    con_extra = {**base, **filas([99])}
+    g1, g2, g3 = T0, T0 + timedelta(hours=1), T0 + timedelta(hours=2)
+    g4 = g3 + timedelta(days=8)
+    ultima = {**filas(range(1, 5)), **filas([7])}
+
+    cargar(cursor, g1, base)
+    cargar(cursor, g2, con_extra)
+    cargar(cursor, g3, base)
+    # g3 is the newest generation outside the 7-day window: g1 and g2 fold into it
+    cargar(cursor, g4, ultima)
+
+    assert [row[0] for row in generaciones(cursor)] == [g3, g4]
+    assert as_of(cursor, g3) == base
+    assert as_of(cursor, g4) == ultima
+
+    # The row inserted in g2 and deleted in g3 leaves nothing behind
+    cursor.execute("""
+        SELECT COUNT(*) FROM pipeline.data_generation_changes WHERE data_type = %s AND id = 'r099'
+    """, (DATA_TYPE,))
+    assert cursor.fetchone()[0] == 0
+    # Deletions at or before the base are dropped; the base keeps one delta per live row
+    cursor.execute("""
+        SELECT generation, operation, COUNT(*) FROM pipeline.data_generation_changes
+        WHERE data_type = %s GROUP BY 1, 2 ORDER BY 1, 2
+    """, (DATA_TYPE,))
+    assert cursor.fetchall() == [(g1, "I", 5), (g4, "D", 1), (g4, "I", 1)]
+
+
+def test_content_ids_ignore_position():
+    def ids(planilla):
+        ocurrencias = {}
+        return [extraer.id_por_contenido(fila, ocurrencias) for fila in planilla]
+
+    planilla = [{"A": "x", "B": 1}, {"A": "y", "B": 2}, {"A": "x", "B": 1}]
+    originales = ids(planilla)
+    # A row inserted ahead of the others leaves their ids unchanged
+    desplazados = ids([{"A": "z", "B": 3}] + planilla)
+
+    assert desplazados[1:] == originales
+    # Identical rows are numbered in order of appearance
+    assert originales[2] == originales[0] + "_2"
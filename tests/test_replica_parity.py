@@ -0,0 +1,98 @@
+"""
+The in-memory calidad replica (api/app/replica.py) must return the same rows
+as DataService over Postgres for every query it accepts.
+"""
+
+import orjson
+import pytest
+
+from app.replica import CalidadReplica, ReplicaUnsupported
+from app.schemas import FilterCondition
+from app.services import DataService
+
+# Rows added inside the test transaction: LIKE wildcards and a backslash in a
+# text value, and a row without OBSERVACIONES
+PARITY_ROWS = [
+    ("parity_wildcards", {
+        "EMPRESA": "SAN LUCAR S.A.", "PRODUCTOR": "PARITY_100% \\ BERRIES", "VARIEDAD": "VENTURA",
+        "TURNO": 1, "FECHA DE PROCESO": "2025-03-15T00:00:00", "OBSERVACIONES": "-",
+    }),
+    ("parity_missing_key", {
+        "EMPRESA": "SAN LUCAR S.A.", "PRODUCTOR": "PARITY BERRIES", "VARIEDAD": "BILOXI",
+        "TURNO": 2, "FECHA DE PROCESO": "2025-03-16T00:00:00",
+    }),
+]
+
+QUERIES = [
+    {"limit": 50},
+    {"limit": 20, "offset": 35},
+    {"filters": {"PRODUCTOR": "berr", "VARIEDAD": "ventura"}, "limit": 100, "offset": 10},
+    {"filters": {"PRODUCTOR": "parity"}},
+    {"empresa": "san lucar", "limit": 30},
+    {"match": {"EMPRESA": "SAN LUCAR S.A."}, "limit": 100},
+    {"match": {"TURNO": 1}, "fields": ["EMPRESA", "TURNO", "record_id"], "limit": 100},
+    {"match": {"FECHA DE PROCESO": "2025-03-15T00:00:00"}},
+    {"match": {"FECHA DE PROCESO": "2025-03-15"}},
+    {"match": {"FECHA DE PROCESO": "2025-03-15 00:00:00"}},
+    {"filters": {"PRODUCTOR": "parity"}, "fields": ["OBSERVACIONES", "PRODUCTOR", "row_index"]},
+    {"where": [FilterCondition(field="FECHA DE PROCESO", op="between", values=["2025-03-01", "2025-03-31"])]},
+    {"where": [FilterCondition(field="PRODUCTOR", op="prefix", value="PARITY_")]},
+]
+
+
+# Substring values with ILIKE pattern characters are patterns on the SQL path,
+# and text ranges follow the database collation; the replica declines both so
+# the API answers from Postgres
+UNSUPPORTED_QUERIES = [
+    {"filters": {"PRODUCTOR": "_"}},
+    {"filters": {"PRODUCTOR": "100%"}},
+    {"filters": {"PRODUCTOR": "\\"}},
+    {"filters": {"EMPRESA": "SAN%LUCAR"}},
+    {"empresa": "%"},
+    {"where": [FilterCondition(field="PRODUCTOR", op="gte", value="PARITY")]},
+    {"where": [FilterCondition(field="VARIEDAD", op="between", values=["A", "C"])]},
+]
+
+
+@pytest.fixture
+def replica(cursor):
+    """Replica of the current generation plus PARITY_ROWS (rolled back afterwards)"""
+    cursor.execute("""
+        SELECT MAX(created_at) FROM pipeline.pipeline_data WHERE data_type = 'calidad_producto_terminado'
+    """)
+    generation = cursor.fetchone()[0]
+    if generation is None:
+        pytest.skip("no calidad rows loaded")
+    cursor.execute("""
+        SELECT column_name, short_key FROM pipeline.data_columns WHERE data_type = 'calidad_producto_terminado'
+    """)
+    keys = dict(cursor.fetchall())
+    for row_index, (record_id, data) in enumerate(PARITY_ROWS, start=10**6):
+        processed = {"row_index": row_index, "data": {keys[name]: value for name, value in data.items()}}
+        cursor.execute("""
+            INSERT INTO pipeline.pipeline_data (id, source_file, data_type, processed_data, created_at, updated_at)
+            VALUES (%s, 'parity.xlsx', 'calidad_producto_terminado', %s, %s, %s)
+        """, (record_id, orjson.dumps(processed).decode(), generation, generation))
+    return CalidadReplica.load(cursor.connection)
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=[orjson.dumps(q, default=repr).decode() for q in QUERIES])
+def test_replica_matches_postgres(cursor, replica, query):
+    expected = orjson.loads(DataService().get_calidad_producto_terminado_json(cursor.connection, **query))
+    actual = orjson.loads(replica.query_json(**query))
+    assert [row["id"] for row in actual] == [row["id"] for row in expected]
+    assert actual == expected
+
+
+@pytest.mark.parametrize("query", UNSUPPORTED_QUERIES, ids=[orjson.dumps(q, default=repr).decode() for q in UNSUPPORTED_QUERIES])
+def test_replica_declines_like_patterns(replica, query):
+    with pytest.raises(ReplicaUnsupported):
+        replica.query_json(**query)
+
+
+def test_substring_filters_are_ilike_patterns(cursor, replica):
+    rows = orjson.loads(DataService().get_calidad_producto_terminado_json(
+        cursor.connection, filters={"EMPRESA": "SAN%LUCAR"}
+    ))
+    assert rows
+    assert all(row["processed_data"]["data"]["EMPRESA"] == "SAN LUCAR S.A." for row in rows)